@@ -1,15 +1,33 @@
 # backend/main.py
-from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 import numpy as np
-import random
 import os
 import json
 import re
 import copy
+import asyncio
+import bisect
+import functools
+import hashlib
+import hmac
+import itertools
+import logging
+import multiprocessing
+import random
+import sys
+import warnings
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 import google.generativeai as genai
-from typing import Dict, Optional, List, Any
+from typing import Callable, Dict, Iterator, Optional, List, Any, Tuple
 from dotenv import load_dotenv
 import json, re, copy
 import os
@@ -23,6 +41,113 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
+# Structured logging: one line per record ("json" or "text"), one access line per sampled request
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats a record plus its extra={"fields": {...}} as a single JSON or key=value line."""
+
+    def __init__(self, as_json: bool = True):
+        super().__init__()
+        self.as_json = as_json
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            fields["exc"] = self.formatException(record.exc_info)
+        if self.as_json:
+            return json.dumps(fields, default=str, ensure_ascii=False)
+        return " ".join(f"{k}={v}" for k, v in fields.items())
+
+
+def _configure_logging() -> logging.Logger:
+    root = logging.getLogger("budget_brain")
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(StructuredFormatter(as_json=LOG_FORMAT != "text"))
+        root.addHandler(handler)
+        root.propagate = False  # keep uvicorn's root config from printing every line twice
+    root.setLevel(LOG_LEVEL)
+    return root
+
+
+logger = _configure_logging()
+access_logger = logging.getLogger("budget_brain.access")
+
+# Where benchmark research comes from: "gemini" (Google API, needs GEMINI_API_KEY) or "fake"
+# (FakeGeminiModel: local, no network; latency/failure injection below)
+RESEARCH_BACKEND = os.getenv("RESEARCH_BACKEND", "gemini")
+FAKE_GEMINI_LATENCY_MS = float(os.getenv("FAKE_GEMINI_LATENCY_MS", "800"))
+FAKE_GEMINI_JITTER_MS = float(os.getenv("FAKE_GEMINI_JITTER_MS", "200"))
+FAKE_GEMINI_ERROR_RATE = float(os.getenv("FAKE_GEMINI_ERROR_RATE", "0"))
+FAKE_GEMINI_MALFORMED_RATE = float(os.getenv("FAKE_GEMINI_MALFORMED_RATE", "0"))
+FAKE_GEMINI_SEED = int(os.environ["FAKE_GEMINI_SEED"]) if os.getenv("FAKE_GEMINI_SEED") else None
+
+# Blocking Gemini calls run here so a slow LLM round trip never stalls the event loop
+GEMINI_MAX_WORKERS = int(os.getenv("GEMINI_MAX_WORKERS", "8"))
+GEMINI_EXECUTOR = ThreadPoolExecutor(max_workers=GEMINI_MAX_WORKERS, thread_name_prefix="gemini")
+
+# Best-so-far updates emitted by /optimize/stream while the grid is scored
+STREAM_SEARCH_CHUNKS = int(os.getenv("STREAM_SEARCH_CHUNKS", "4"))
+
+# On-demand profiling of single /optimize calls: send the token as X-Profile-Token or ?profile=<token>
+# (unset disables it)
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
+
+# Upper bound on companies per POST /optimize/batch
+OPTIMIZE_BATCH_MAX_SIZE = int(os.getenv("OPTIMIZE_BATCH_MAX_SIZE", "500"))
+
+# >0 runs the CPU-bound optimization core in that many worker processes (0 = inline on the event loop)
+OPTIMIZER_PROCESS_WORKERS = int(os.getenv("OPTIMIZER_PROCESS_WORKERS", "0"))
+
+# Monte Carlo draws per candidate when scoring allocations (vectorized, so cheap to raise)
+MC_SCORE_DRAWS = int(os.getenv("MC_SCORE_DRAWS", "200"))
+# Draws behind the per-platform P10/P50/P90 bands in the final report
+MC_REPORT_DRAWS = int(os.getenv("MC_REPORT_DRAWS", "1000"))
+# Uniform source behind every draw: "random" (pseudo-random), "sobol" (scrambled Sobol)
+# or "lhs" (Latin hypercube); the QMC options need far fewer draws for stable bands
+MC_SAMPLER = os.getenv("MC_SAMPLER", "random")
+
+# How the allocation is searched: "grid" (ALLOCATION_GRID_STEP lattice), "continuous" (exact LP over the simplex),
+# "refine" (10% grid refined around the best cells at 5%, 2% and 1%)
+# or "racing" (ALLOCATION_GRID_STEP lattice with successive halving of candidates)
+OPTIMIZER_SEARCH_MODE = os.getenv("OPTIMIZER_SEARCH_MODE", "grid")
+REFINE_STEPS = [10, 5, 2, 1]  # percentage points per level
+# Spacing of the grid/racing candidate lattice in percentage points (1 = ~25k candidates)
+ALLOCATION_GRID_STEP = int(os.getenv("ALLOCATION_GRID_STEP", "10"))
+REFINE_TOP_K = int(os.getenv("REFINE_TOP_K", "3"))
+RACING_INITIAL_DRAWS = int(os.getenv("RACING_INITIAL_DRAWS", "20"))
+RACING_Z = 2.0  # width of the confidence bound used to eliminate candidates
+# How candidates are scored: "monte_carlo" (sampled) or "analytic" (exact triangular expectations)
+OPTIMIZER_SCORING_MODE = os.getenv("OPTIMIZER_SCORING_MODE", "monte_carlo")
+
+# Researched benchmarks change at most daily, so keep them in-process between requests
+BENCHMARK_CACHE_TTL_SECONDS = float(os.getenv("BENCHMARK_CACHE_TTL_SECONDS", str(24 * 3600)))
+BENCHMARK_CACHE_SIZE = int(os.getenv("BENCHMARK_CACHE_SIZE", "64"))
+# On-disk copy that survives redeploys/cold starts; set BENCHMARK_STORE_DIR="" to disable
+BENCHMARK_STORE_DIR = os.getenv(
+    "BENCHMARK_STORE_DIR", os.path.join(tempfile.gettempdir(), "budget_brain_benchmarks")
+)
+BENCHMARK_STORE_MAX_AGE_SECONDS = float(os.getenv("BENCHMARK_STORE_MAX_AGE_SECONDS", str(24 * 3600)))
+# A stale entry is served from memory for this long per refresh attempt, so a failing
+# Gemini gets one retry per window rather than one per request
+BENCHMARK_REFRESH_RETRY_SECONDS = float(os.getenv("BENCHMARK_REFRESH_RETRY_SECONDS", "60"))
+
+# Memoized /optimize results, keyed on the normalized input + benchmark version (size 0 disables)
+OPTIMIZE_RESULT_CACHE_SIZE = int(os.getenv("OPTIMIZE_RESULT_CACHE_SIZE", "256"))
+OPTIMIZE_RESULT_CACHE_TTL_SECONDS = float(os.getenv("OPTIMIZE_RESULT_CACHE_TTL_SECONDS", str(24 * 3600)))
+
 app = FastAPI(title="Budget Brain API", description="AI-powered ad budget allocation")
 
 # CORS for frontend dev
@@ -38,42 +163,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add logging middleware for debugging
+CORS_ALLOW_ORIGIN = "https://budget-brain-djxl.vercel.app"
+
 @app.middleware("http")
 async def cors_handler(request: Request, call_next):
-    # Log incoming request details
-    print(f"=== CORS Handler ===")
-    print(f"Method: {request.method}")
-    print(f"URL: {request.url}")
-    print(f"Path: {request.url.path}")
-    print(f"Origin: {request.headers.get('origin', 'NO ORIGIN')}")
-    print(f"Headers: {dict(request.headers)}")
-    
+    """Answers preflights, adds the CORS headers and writes one access log line per (sampled) request."""
+    start = time.perf_counter()
+    # Decide up front so unsampled requests (or a level above INFO) pay for nothing but this check
+    log_access = access_logger.isEnabledFor(logging.INFO) and (
+        ACCESS_LOG_SAMPLE_RATE >= 1.0 or random.random() < ACCESS_LOG_SAMPLE_RATE
+    )
+
     # Handle preflight OPTIONS requests
     if request.method == "OPTIONS":
-        print("🔥 Handling OPTIONS request")
         response = Response(status_code=200)
-        response.headers["Access-Control-Allow-Origin"] = "https://budget-brain-djxl.vercel.app"
+        response.headers["Access-Control-Allow-Origin"] = CORS_ALLOW_ORIGIN
         response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
         response.headers["Access-Control-Allow-Headers"] = "*"
         response.headers["Access-Control-Allow-Credentials"] = "true"
-        
-        print(f"OPTIONS Response Headers: {dict(response.headers)}")
-        print("=== END CORS Handler ===\n")
-        return response
-    
-    # Process regular requests
-    print("🚀 Processing regular request")
-    response = await call_next(request)
-    
-    # Add CORS headers to all responses
-    response.headers["Access-Control-Allow-Origin"] = "https://budget-brain-djxl.vercel.app"
-    response.headers["Access-Control-Allow-Credentials"] = "true"
-    
-    print(f"Regular Response Status: {response.status_code}")
-    print(f"Regular Response Headers: {dict(response.headers)}")
-    print("=== END CORS Handler ===\n")
-    
+    else:
+        try:
+            response = await call_next(request)
+        except Exception:
+            access_logger.exception("request failed", extra={"fields": {
+                "method": request.method,
+                "path": request.url.path,
+                "duration_ms": round((time.perf_counter() - start) * 1000.0, 2),
+            }})
+            raise
+        # Add CORS headers to all responses
+        response.headers["Access-Control-Allow-Origin"] = CORS_ALLOW_ORIGIN
+        response.headers["Access-Control-Allow-Credentials"] = "true"
+
+    elapsed = time.perf_counter() - start
+    # Label by route template (e.g. /research/{industry}) so the series count stays bounded
+    route = request.scope.get("route")
+    ROUTE_LATENCY.observe(elapsed, request.method, route.path if route else "unmatched", str(response.status_code))
+    if log_access:
+        access_logger.info("request", extra={"fields": {
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            "duration_ms": round(elapsed * 1000.0, 2),
+            "origin": request.headers.get("origin"),
+            "client": request.client.host if request.client else None,
+        }})
     return response
 
 
@@ -88,6 +222,19 @@ PLATFORM_BENCHMARKS = {
     "linkedin": {"cpm": 69.49, "ctr": 0.96, "cvr": 5.09, "description": "B2B professionals and decision makers"},
 }
 
+PLATFORMS = ["google", "meta", "tiktok", "linkedin"]
+METRICS = ["cpm", "ctr", "cvr"]
+BANDS = ["low", "mid", "high"]
+
+# Per-platform share limits; the allocation lattice spans exactly these ranges
+ALLOCATION_BOUNDS = {
+    "google": (0.20, 0.70),
+    "meta": (0.10, 0.50),
+    "tiktok": (0.05, 0.40),
+    "linkedin": (0.10, 0.40),
+}
+SOCIAL_PLATFORMS = ["meta", "tiktok"]
+
 # Industry modifiers (relative effects). We'll apply them primarily to CTR/CVR.
 INDUSTRY_MODIFIERS = {
     "b2b_saas":  {"google": 1.2, "meta": 0.8, "tiktok": 0.6, "linkedin": 1.5},
@@ -113,6 +260,7 @@ class CompanyInput(BaseModel):
     goal: str
     industry: Optional[str] = "default"
     assumptions: Optional[AssumptionOverrides] = None
+    seed: Optional[int] = Field(None, ge=0)  # fixes the Monte Carlo streams so the result is reproducible
 
 class BudgetBreakdown(BaseModel):
     google: float
@@ -137,6 +285,476 @@ class OptimizationResult(BaseModel):
     total_expected_leads: ConfidenceRange
     reasoning: str
     sources: list  # can be list[str] or list[{"title","url"}]
+    search_stats: Optional[Dict[str, Any]] = None  # search mode + candidates evaluated
+    profile: Optional[Dict[str, Any]] = None  # only on profiled requests (see SamplingProfiler)
+    seed: Optional[int] = None  # send back (CompanyInput.seed, or ?seed= for batches) to reproduce this result
+
+# ----------------------------
+# Allocation lattice
+# ----------------------------
+DEFAULT_ASSUMPTIONS = AssumptionOverrides()
+
+@functools.lru_cache(maxsize=None)
+def allocation_lattice(step: int = ALLOCATION_GRID_STEP) -> np.ndarray:
+    """
+    Every allocation on a `step`-percentage-point grid within ALLOCATION_BOUNDS, as a read-only
+    (N x platforms) share matrix; tiktok takes the remainder. Rows come in google, meta, linkedin
+    loop order, so step=10 is exactly the classic 10% grid. Built once per step.
+    """
+    pct = {p: (round(lo * 100), round(hi * 100)) for p, (lo, hi) in ALLOCATION_BOUNDS.items()}
+    axes = [np.arange(pct[p][0], pct[p][1] + 1, step) for p in ("google", "meta", "linkedin")]
+    google, meta, linkedin = (a.ravel() for a in np.meshgrid(*axes, indexing="ij"))
+    tiktok = 100 - google - meta - linkedin
+    keep = (tiktok >= pct["tiktok"][0]) & (tiktok <= pct["tiktok"][1])
+    columns = {"google": google, "meta": meta, "tiktok": tiktok, "linkedin": linkedin}
+    lattice = np.column_stack([columns[p][keep] for p in PLATFORMS]) / 100
+    lattice.flags.writeable = False
+    return lattice
+
+allocation_lattice()  # build the configured lattice at import, off the request path
+
+def constraint_mask(allocations: np.ndarray, lower: np.ndarray, upper: np.ndarray, social_floor: float) -> np.ndarray:
+    """Rows of an (N x platforms) share matrix that satisfy BudgetOptimizer.allocation_limits."""
+    mask = np.ones(len(allocations), dtype=bool)
+    for i in range(len(PLATFORMS)):
+        column = allocations[:, i]
+        mask &= (column >= lower[i]) & (column <= upper[i])
+    if social_floor > 0:
+        meta, tiktok = (allocations[:, PLATFORMS.index(p)] for p in SOCIAL_PLATFORMS)
+        mask &= meta + tiktok >= social_floor
+    return mask
+
+@functools.lru_cache(maxsize=256)
+def _feasible_lattice(step: int, lower: Tuple[float, ...], upper: Tuple[float, ...], social_floor: float) -> np.ndarray:
+    # Keyed on the limits rather than the company, so every request with the same constraints shares one matrix
+    lattice = allocation_lattice(step)
+    feasible = lattice[constraint_mask(lattice, np.array(lower), np.array(upper), social_floor)]
+    feasible.flags.writeable = False
+    return feasible
+
+# ----------------------------
+# In-process cache
+# ----------------------------
+class TTLCache:
+    """Thread-safe bounded mapping with a per-entry TTL, LRU eviction and hit/miss counters."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def invalidate(self, predicate: Callable[[Any], bool]) -> int:
+        """Drop every entry whose key matches predicate; returns how many were removed."""
+        with self._lock:
+            stale = [k for k in self._data if predicate(k)]
+            for k in stale:
+                del self._data[k]
+            return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+# ----------------------------
+# Prometheus metrics
+# ----------------------------
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_pairs(names: Tuple[str, ...], values: Tuple[str, ...]) -> List[str]:
+    escape = lambda v: str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return [f'{n}="{escape(v)}"' for n, v in zip(names, values)]
+
+
+class Histogram:
+    """Labelled histogram in Prometheus text format; observe() is one bisect and two adds under a lock."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # label values -> per-bucket counts (last slot is +Inf), then the running sum
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], List[float]]:
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    def merge(self, snapshot: Dict[Tuple[str, ...], List[float]]) -> None:
+        """Fold in observations recorded elsewhere (e.g. in a process-pool worker)."""
+        with self._lock:
+            for labels, values in snapshot.items():
+                series = self._series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+                for i, v in enumerate(values):
+                    series[i] += v
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.snapshot().items()):
+            pairs = _label_pairs(self.labelnames, labels)
+            cumulative = 0
+            for le, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                bound = "+Inf" if le == float("inf") else repr(le)
+                labels_le = ",".join(pairs + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{labels_le}}} {cumulative}")
+            lines.append(f'{self.name}_sum{{{",".join(pairs)}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{",".join(pairs)}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    """Labelled monotonically increasing counter in Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines += [f'{self.name}{{{",".join(_label_pairs(self.labelnames, labels))}}} {v}' for labels, v in values]
+        return lines
+
+
+STAGE_LATENCY = Histogram(
+    "budget_brain_stage_duration_seconds",
+    "Wall time of each /optimize pipeline stage",
+    ("stage",),
+)
+ROUTE_LATENCY = Histogram(
+    "budget_brain_http_request_duration_seconds",
+    "Time to response start per route (streaming bodies continue after it)",
+    ("method", "route", "status"),
+)
+GEMINI_CALLS = Counter(
+    "budget_brain_gemini_calls_total",
+    "Gemini round trips by call site and outcome (ok, error, invalid_response)",
+    ("call", "outcome"),
+)
+BENCHMARK_FALLBACKS = Counter(
+    "budget_brain_benchmark_fallbacks_total",
+    "Benchmark requests answered with the built-in PLATFORM_BENCHMARKS ranges",
+    ("reason",),
+)
+
+
+def timed_stage(stage: str):
+    """Decorator recording each call's wall time in STAGE_LATENCY under `stage` (sync or async)."""
+    def decorate(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with STAGE_LATENCY.time(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with STAGE_LATENCY.time(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _cache_metrics(caches: Dict[str, "TTLCache"]) -> List[str]:
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    lines: List[str] = []
+    for field, kind, doc in [
+        ("hits", "counter", "Cache lookups that found a live entry"),
+        ("misses", "counter", "Cache lookups that found nothing or an expired entry"),
+        ("evictions", "counter", "Entries dropped to stay within maxsize"),
+        ("hit_ratio", "gauge", "hits / (hits + misses) since start"),
+        ("size", "gauge", "Entries currently held"),
+    ]:
+        name = f"budget_brain_cache_{field}" + ("_total" if kind == "counter" else "")
+        lines += [f"# HELP {name} {doc}", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{cache="{cache}"}} {s[field]}' for cache, s in stats.items()]
+    return lines
+
+# ----------------------------
+# On-demand profiling
+# ----------------------------
+class SamplingProfiler:
+    """
+    Statistical profiler for one call: a background thread snapshots the calling thread's
+    Python stack every `interval` seconds, so the profiled code runs unmodified and
+    other threads (the rest of the traffic) are never sampled.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000.0):
+        self.interval = interval
+        self.stacks: Dict[Tuple[str, ...], int] = {}
+        self.duration = 0.0
+
+    def _sample(self, thread_id: int, stop: threading.Event) -> None:
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            # Walk up to (not including) run() so executor/thread plumbing stays out of the profile
+            while frame is not None and frame.f_code is not SamplingProfiler.run.__code__:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack and not stop.is_set():  # a sample taken after fn returned would show run()'s cleanup
+                key = tuple(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Call fn(*args) on the current thread while sampling it."""
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(threading.get_ident(), stop), daemon=True)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            return fn(*args)
+        finally:
+            stop.set()
+            sampler.join()
+            self.duration = time.perf_counter() - start
+
+    def report(self, top_n: int = PROFILE_TOP_N) -> Dict[str, Any]:
+        """Top-N functions by self samples, plus folded stacks ("a;b;c count") for flame graph tools."""
+        self_samples: Dict[str, int] = {}
+        total_samples: Dict[str, int] = {}
+        for stack, n in self.stacks.items():
+            self_samples[stack[-1]] = self_samples.get(stack[-1], 0) + n
+            for fn in set(stack):
+                total_samples[fn] = total_samples.get(fn, 0) + n
+        samples = sum(self.stacks.values())
+        ranked = sorted(total_samples, key=lambda fn: (self_samples.get(fn, 0), total_samples[fn]), reverse=True)
+        return {
+            "duration_ms": round(self.duration * 1000.0, 3),
+            "interval_ms": self.interval * 1000.0,
+            "samples": samples,
+            "top": [
+                {
+                    "function": fn,
+                    "self_samples": self_samples.get(fn, 0),
+                    "total_samples": total_samples[fn],
+                    "self_pct": round(100.0 * self_samples.get(fn, 0) / samples, 2),
+                    "total_pct": round(100.0 * total_samples[fn] / samples, 2),
+                }
+                for fn in ranked[:top_n]
+            ],
+            "folded": [f"{';'.join(stack)} {n}" for stack, n in sorted(self.stacks.items(), key=lambda kv: -kv[1])],
+        }
+
+# ----------------------------
+# Research backends
+# ----------------------------
+class FakeGeminiResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """
+    Offline stand-in for genai.GenerativeModel with the same generate_content(prompt) -> .text
+    surface. Benchmark prompts get range JSON and sources shaped like Gemini's answers (stable
+    per prompt, so per industry/year); other prompts get a short explanation. Every call waits
+    ~N(latency_ms, jitter_ms) and fails with error_rate or returns unparseable text with
+    malformed_rate, so caching, single-flight and fallbacks can be exercised without a network.
+    """
+
+    MALFORMED_ANSWERS = [
+        '{"google": {"cpm": {"low": 40, "mid": 5',  # truncated mid-object
+        "I'm sorry, I can't provide exact benchmark figures, but typical CPMs vary widely.",
+        "```json\n{google: {cpm: 50}}\n```",  # not valid JSON
+    ]
+
+    def __init__(
+        self,
+        latency_ms: float = FAKE_GEMINI_LATENCY_MS,
+        jitter_ms: float = FAKE_GEMINI_JITTER_MS,
+        error_rate: float = FAKE_GEMINI_ERROR_RATE,
+        malformed_rate: float = FAKE_GEMINI_MALFORMED_RATE,
+        seed: Optional[int] = FAKE_GEMINI_SEED,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str) -> FakeGeminiResponse:
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms)) / 1000.0
+            roll = self._rng.random()
+            malformed = self._rng.choice(self.MALFORMED_ANSWERS)
+        time.sleep(delay)
+        if roll < self.error_rate:
+            raise RuntimeError("FakeGeminiModel: injected API error")
+        if "STRICT JSON" not in prompt:
+            return FakeGeminiResponse(
+                "This mix leans on high-intent search while keeping social reach for discovery; "
+                "LinkedIn covers professional decision makers. (offline fake explanation)"
+            )
+        if roll < self.error_rate + self.malformed_rate:
+            return FakeGeminiResponse(malformed)
+        return FakeGeminiResponse(json.dumps(self._benchmark_answer(prompt)))
+
+    @staticmethod
+    def _benchmark_answer(prompt: str) -> Dict[str, Any]:
+        # Seeded from the prompt so the same industry/year always gets the same "research"
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        answer: Dict[str, Any] = {}
+        for platform in PLATFORMS:
+            base = PLATFORM_BENCHMARKS[platform]
+            node: Dict[str, Any] = {"desc": base["description"]}
+            for metric in METRICS:
+                mid = round(base[metric] * rng.uniform(0.85, 1.15), 2)
+                node[metric] = {
+                    "low": round(mid * rng.uniform(0.6, 0.85), 2),
+                    "mid": mid,
+                    "high": round(mid * rng.uniform(1.15, 1.5), 2),
+                }
+            answer[platform] = node
+        answer["sources"] = [
+            {"title": "Offline fake research: search ads benchmarks", "url": "https://example.invalid/search-ads"},
+            {"title": "Offline fake research: social ads benchmarks", "url": "https://example.invalid/social-ads"},
+            {"title": "Offline fake research: B2B ads benchmarks", "url": "https://example.invalid/b2b-ads"},
+        ]
+        return answer
+
+
+def make_research_model(backend: str = RESEARCH_BACKEND) -> Optional[Any]:
+    """The model GeminiResearchService calls, or None to use PLATFORM_BENCHMARKS fallbacks only."""
+    if backend == "fake":
+        logger.info("Researching benchmarks with the offline FakeGeminiModel")
+        return FakeGeminiModel()
+    if backend != "gemini":
+        raise ValueError(f"Unknown RESEARCH_BACKEND {backend!r} (expected 'gemini' or 'fake')")
+    if not GEMINI_API_KEY:
+        return None
+    try:
+        return genai.GenerativeModel("gemini-1.5-flash")
+    except Exception as e:
+        logger.error(f"Failed to initialize Gemini model: {e}")
+        return None
+
+# ----------------------------
+# Persistent benchmark store
+# ----------------------------
+class BenchmarkStore:
+    """One JSON file per (industry, year) holding the last researched payload and its fetch time."""
+
+    def __init__(self, directory: str, max_age: float):
+        self.directory = directory
+        self.max_age = max_age
+
+    def _path(self, industry: str, year: int) -> str:
+        # Industry comes straight from the URL on /research/{industry}; keep it a plain file name,
+        # with a hash of the raw string so e.g. "B2B_SaaS" and "b2b_saas" never share a file
+        safe = re.sub(r"[^a-z0-9_-]+", "_", industry.lower()) or "default"
+        digest = hashlib.sha256(industry.encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.directory, f"{safe}_{digest}_{year}.json")
+
+    def load(self, industry: str, year: int) -> Optional[Tuple[Dict[str, Any], float]]:
+        try:
+            with open(self._path(industry, year), "r", encoding="utf-8") as f:
+                record = json.load(f)
+            if record.get("industry") != industry or record.get("year") != year:
+                logger.warning(f"Ignoring benchmark store entry for {record.get('industry')!r}, requested {industry!r}")
+                return None
+            payload, fetched_at = record["payload"], float(record["fetched_at"])
+            payload.setdefault("fetched_at", fetched_at)
+            return payload, fetched_at
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable benchmark store entry for {industry}: {e}")
+            return None
+
+    def save(self, industry: str, year: int, payload: Dict[str, Any]) -> None:
+        path = self._path(industry, year)
+        fetched_at = payload.get("fetched_at", time.time())
+        record = {"industry": industry, "year": year, "fetched_at": fetched_at, "payload": payload}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)  # atomic, so readers never see a half-written file
+        except OSError as e:
+            logger.warning(f"Could not persist benchmarks for {industry}: {e}")
+
+    def age(self, fetched_at: float) -> float:
+        return max(0.0, time.time() - fetched_at)
 
 # ----------------------------
 # Gemini Research Service
@@ -156,14 +774,26 @@ class GeminiResearchService:
         },
         "sources": [{"title": "...", "url": "..."}, ...]
       }
+    Successful research is cached per (industry, year) for BENCHMARK_CACHE_TTL_SECONDS
+    and persisted to BENCHMARK_STORE_DIR. Stale stored entries are served immediately
+    while a background refresh runs; PLATFORM_BENCHMARKS is only used when nothing is stored.
     """
-    def __init__(self):
-        self.model = None
-        if GEMINI_API_KEY:
-            try:
-                self.model = genai.GenerativeModel("gemini-1.5-flash")
-            except Exception as e:
-                print(f"Failed to initialize Gemini model: {e}")
+    def __init__(self, model: Optional[Any] = None):
+        # Anything with generate_content(prompt) -> object with .text; see make_research_model
+        self.model = model if model is not None else make_research_model()
+        self.cache = TTLCache(BENCHMARK_CACHE_SIZE, BENCHMARK_CACHE_TTL_SECONDS)
+        store_dir = BENCHMARK_STORE_DIR
+        if store_dir and isinstance(self.model, FakeGeminiModel):
+            # Synthetic research must never be served as real data by a Gemini-backed server
+            store_dir = os.path.join(store_dir, "fake")
+        self.store = BenchmarkStore(store_dir, BENCHMARK_STORE_MAX_AGE_SECONDS) if store_dir else None
+        # Single-flight: at most one Gemini fetch per (industry, year); concurrent callers share it
+        self._inflight: Dict[Tuple[str, int], Future] = {}
+        # Same for whole async gathers, so waiting routes never each hold a GEMINI_EXECUTOR thread
+        self._gathering: Dict[Tuple[str, int], Future] = {}
+        self._inflight_lock = threading.Lock()
+        # Called with (industry, year) whenever fresh research replaces the cached payload
+        self.refresh_listeners: List[Callable[[str, int], None]] = []
 
     def _safe_json_loads(self, s: str) -> Optional[Dict[str, Any]]:
         s = s.strip().strip("```").strip()
@@ -231,8 +861,112 @@ class GeminiResearchService:
         return adj
 
     def gather_platform_benchmarks(self, industry: str = "default", year: int = 2025) -> Dict[str, Any]:
+        payload = self.cache.get((industry, year))
+        if payload is not None:
+            return payload
+        return self._gather_uncached(industry, year)
+
+    @timed_stage("benchmarks")
+    async def agather_platform_benchmarks(self, industry: str = "default", year: int = 2025) -> Dict[str, Any]:
+        """Async variant for routes: cache hits return inline, anything else waits on GEMINI_EXECUTOR."""
+        key = (industry, year)
+        payload = self.cache.get(key)
+        if payload is not None:
+            return payload
+        # Register the future before dispatching: later callers await it instead of queueing
+        # behind the leader for an executor thread and each becoming a leader in turn
+        with self._inflight_lock:
+            future = self._gathering.get(key)
+            leader = future is None
+            if leader:
+                future = self._gathering[key] = Future()
+        if leader:
+            GEMINI_EXECUTOR.submit(self._gather_for_waiters, key, future)
+        return await asyncio.wrap_future(future)
+
+    def _gather_for_waiters(self, key: Tuple[str, int], future: Future) -> None:
+        try:
+            future.set_result(self._gather_uncached(*key))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._inflight_lock:
+                self._gathering.pop(key, None)
+
+    async def agenerate_text(self, prompt: str) -> Optional[str]:
         if not self.model:
+            return None
+        loop = asyncio.get_running_loop()
+        try:
+            resp = await loop.run_in_executor(GEMINI_EXECUTOR, self.model.generate_content, prompt)
+        except Exception:
+            GEMINI_CALLS.inc("explain", "error")
+            raise
+        GEMINI_CALLS.inc("explain", "ok")
+        return resp.text if resp else None
+
+    def _gather_uncached(self, industry: str, year: int) -> Dict[str, Any]:
+        key = (industry, year)
+        stored = self.store.load(industry, year) if self.store else None
+        if stored is not None:
+            payload, fetched_at = stored
+            remaining = self.store.max_age - self.store.age(fetched_at)
+            if remaining > 0:
+                self.cache.set(key, payload, ttl=min(remaining, self.cache.ttl))
+            else:
+                # Stale-while-revalidate: answer now, refresh for the next caller
+                self._refresh_in_background(industry, year)
+                self.cache.set(key, payload, ttl=min(BENCHMARK_REFRESH_RETRY_SECONDS, self.cache.ttl))
+            return payload
+
+        payload = self._refresh(industry, year)
+        if payload is None:
+            # Fallbacks are cheap and not cached, so the next request retries Gemini
+            BENCHMARK_FALLBACKS.inc("research_failed" if self.model else "no_model")
             return {"benchmarks": self._get_fallback_ranges(), "sources": []}
+        return payload
+
+    def _refresh(self, industry: str, year: int, revalidate: bool = False) -> Optional[Dict[str, Any]]:
+        """Research and cache (industry, year) once; revalidate=True replaces a stale cached payload."""
+        key = (industry, year)
+        with self._inflight_lock:
+            # A fetch that finished while this caller queued for a thread already filled the cache
+            cached = None if revalidate else self.cache.get(key)
+            if cached is not None:
+                return cached
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            return future.result()
+
+        try:
+            payload = self._research_benchmarks(industry, year)
+            if payload is not None:
+                self.cache.set(key, payload)
+                if self.store:
+                    self.store.save(industry, year, payload)
+                for listener in self.refresh_listeners:
+                    listener(industry, year)
+            future.set_result(payload)
+            return payload
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, industry: str, year: int) -> None:
+        if (industry, year) not in self._inflight:
+            GEMINI_EXECUTOR.submit(self._refresh, industry, year, revalidate=True)
+
+    def _research_benchmarks(self, industry: str, year: int) -> Optional[Dict[str, Any]]:
+        """One Gemini round trip; None when the model is unavailable or the answer is unusable."""
+        if not self.model:
+            return None
 
         # Enhanced prompt for better research and citations
         industry_context = {
@@ -294,11 +1028,13 @@ Research focus:
 - Focus on credible marketing publications and industry reports
 """
         try:
-            resp = self.model.generate_content(prompt)
+            with STAGE_LATENCY.time("gemini_research"):
+                resp = self.model.generate_content(prompt)
             text = (resp.text or "").strip()
             data = self._safe_json_loads(text)
             if not data:
-                return {"benchmarks": self._get_fallback_ranges(), "sources": []}
+                GEMINI_CALLS.inc("research", "invalid_response")
+                return None
 
             ranges = self._coerce_ranges(data)
             sources = data.get("sources", [])
@@ -306,28 +1042,133 @@ Research focus:
                 sources = []
             # Apply industry modifiers
             ranges = self._apply_industry_modifiers_to_ranges(ranges, industry)
-            return {"benchmarks": ranges, "sources": sources}
+            GEMINI_CALLS.inc("research", "ok")
+            return {"benchmarks": ranges, "sources": sources, "fetched_at": time.time()}
         except Exception as e:
-            print("Gemini API error:", e)
-            return {"benchmarks": self._get_fallback_ranges(), "sources": []}
+            GEMINI_CALLS.inc("research", "error")
+            logger.warning(f"Gemini API error: {e}")
+            return None
 
 # ----------------------------
 # Core Optimizer
 # ----------------------------
 class BudgetOptimizer:
-    def __init__(self):
+    def __init__(
+        self,
+        seed: Optional[int] = None,
+        search_mode: Optional[str] = None,
+        scoring_mode: Optional[str] = None,
+        sampler: Optional[str] = None,
+    ):
         self.gemini_service = GeminiResearchService()
-        print("✅ Budget Optimizer initialized (Pure Monte Carlo + Gemini Intelligence)")
+        # Every draw comes from self.rng. Requests run on request_stream() copies with their own
+        # Generator, so nothing shares RNG state across threads, workers or concurrent requests.
+        self.seed: Optional[int] = None  # request-level seed, set on request_stream() copies
+        self.seed_seq = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_seq)
+        self._seed_source = np.random.default_rng(self.seed_seq.spawn(1)[0])
+        self._seed_lock = threading.Lock()
+        self.search_mode = search_mode or OPTIMIZER_SEARCH_MODE
+        self.scoring_mode = scoring_mode or OPTIMIZER_SCORING_MODE
+        self.sampler = sampler or MC_SAMPLER
+        self.result_cache = TTLCache(OPTIMIZE_RESULT_CACHE_SIZE, OPTIMIZE_RESULT_CACHE_TTL_SECONDS)
+        self.gemini_service.refresh_listeners.append(self._invalidate_results)
+        logger.info("✅ Budget Optimizer initialized (Pure Monte Carlo + Gemini Intelligence)")
+
+    def request_stream(
+        self, seed: Optional[int] = None, seed_seq: Optional[np.random.SeedSequence] = None
+    ) -> "BudgetOptimizer":
+        """
+        Shallow copy (sharing caches and the research service) drawing from its own Generator.
+        Seeded from `seed_seq` when given (streams spawned per worker/chunk), else from `seed`;
+        without either a seed is drawn from this optimizer's seed source, so a seeded optimizer
+        hands out a reproducible sequence of request seeds. The seed is echoed in results.
+        """
+        if seed is None and seed_seq is None:
+            with self._seed_lock:
+                seed = int(self._seed_source.integers(2**53))  # exact as a JS number, so clients can send it back
+        stream = copy.copy(self)
+        stream.seed = seed
+        stream.seed_seq = seed_seq if seed_seq is not None else np.random.SeedSequence(seed)
+        stream.rng = np.random.default_rng(stream.seed_seq)
+        return stream
 
     # ----- helpers -----
     @staticmethod
-    def _tri(low: float, mid: float, high: float) -> float:
-        # Triangular sampling favors the "mid" (mode)
-        return random.triangular(low, high, mid)
+    def _range_table(ranges: Dict[str, Dict[str, Any]]) -> np.ndarray:
+        # (platform, metric, band) array in PLATFORMS/METRICS order; bands sorted so low <= mid <= high
+        if isinstance(ranges, np.ndarray):
+            return ranges
+        table = np.array(
+            [[[float(ranges[p][m][b]) for b in BANDS] for m in METRICS] for p in PLATFORMS]
+        )
+        table.sort(axis=2)
+        return table
 
     @staticmethod
-    def _pct(arr: List[float], q: float) -> float:
-        return float(np.percentile(arr, q))
+    def _tri_ppf(u: np.ndarray, low: np.ndarray, mid: np.ndarray, high: np.ndarray) -> np.ndarray:
+        # Inverse CDF of the triangular distribution; degenerate ranges (low == high) return low
+        span = high - low
+        split = np.divide(mid - low, span, out=np.zeros_like(span), where=span > 0)
+        left = low + np.sqrt(u * span * (mid - low))
+        right = high - np.sqrt((1.0 - u) * span * (high - mid))
+        return np.where(u < split, left, right)
+
+    def _uniforms(self, shape: Tuple[int, ...], draws: int) -> np.ndarray:
+        """Uniforms of shape `shape + (draws,)` from the configured sampler, one QMC dimension per cell."""
+        # Draws run along the last axis so every ufunc loops over contiguous memory
+        if self.sampler == "random":
+            return self.rng.random(shape + (draws,))
+
+        from scipy.stats import qmc  # only the QMC samplers need scipy
+
+        dims = int(np.prod(shape))
+        if self.sampler == "sobol":
+            engine = qmc.Sobol(d=dims, scramble=True, seed=self.rng)
+            with warnings.catch_warnings():
+                # Sobol prefers powers of two; any prefix of a scrambled sequence is still unbiased
+                warnings.simplefilter("ignore", UserWarning)
+                points = engine.random(draws)
+        elif self.sampler == "lhs":
+            points = qmc.LatinHypercube(d=dims, seed=self.rng).random(draws)
+        else:
+            raise ValueError(f"Unknown sampler: {self.sampler}")
+        return np.ascontiguousarray(points.T).reshape(shape + (draws,))
+
+    def _sample_leads_per_dollar(self, table: np.ndarray, draws: int) -> np.ndarray:
+        """Draw CPM/CTR/CVR for every platform at once and run the funnel for $1 of spend.
+
+        Returns a (draws, platforms) matrix; multiply by spend to get leads.
+        """
+        u = self._uniforms(table.shape[:2], draws)
+        samples = self._tri_ppf(u, table[..., 0:1], table[..., 1:2], table[..., 2:3])
+        cpm, ctr, cvr = samples[:, 0], samples[:, 1], samples[:, 2]
+        impressions = 1000.0 / np.maximum(cpm, 0.01)
+        return (impressions * (ctr / 100.0) * (cvr / 100.0)).T
+
+    @staticmethod
+    def _analytic_leads_per_dollar(table: np.ndarray) -> np.ndarray:
+        """
+        Exact E[leads per $] per platform: 1000 * E[1/CPM] * E[CTR] * E[CVR] / 1e4 with independent
+        triangular priors. E[X] = (low + mid + high) / 3 and, for X > 0,
+        E[1/X] = 2 / (high - low) * (high*ln(high/mid)/(high - mid) - low*ln(mid/low)/(mid - low)).
+        CPM bands are floored at 0.01, matching the sampler's clamp whenever low >= 0.01.
+        """
+        cpm = np.maximum(table[:, 0, :], 0.01)
+        low, mid, high = cpm[:, 0], cpm[:, 1], cpm[:, 2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Each ratio tends to 1 as its interval collapses
+            left = np.where(mid > low, low * np.log(mid / low) / (mid - low), 1.0)
+            right = np.where(high > mid, high * np.log(high / mid) / (high - mid), 1.0)
+            inv_cpm = np.where(high > low, 2.0 / (high - low) * (right - left), 1.0 / low)
+        ctr, cvr = table[:, 1, :].mean(axis=1), table[:, 2, :].mean(axis=1)
+        return 1000.0 * inv_cpm * (ctr / 100.0) * (cvr / 100.0)
+
+    def _scoring_block(self, table: np.ndarray, draws: int = MC_SCORE_DRAWS) -> np.ndarray:
+        # Rows of leads-per-dollar to score against: Monte Carlo draws, or one exact expectation row
+        if self.scoring_mode == "analytic":
+            return self._analytic_leads_per_dollar(table)[None, :]
+        return self._sample_leads_per_dollar(table, draws)
 
     def _goal_multiplier(self, platform: str, goal: str) -> float:
         multipliers = {
@@ -339,15 +1180,40 @@ class BudgetOptimizer:
         }
         return multipliers.get(goal, {}).get(platform, 1.0)
 
+    def _goal_vector(self, goal: str) -> np.ndarray:
+        return np.array([self._goal_multiplier(p, goal) for p in PLATFORMS])
+
+    # ----- result memoization -----
+    @staticmethod
+    def result_cache_key(company: CompanyInput, bench_payload: Dict[str, Any]) -> Tuple[str, Any, str]:
+        """(industry, benchmark version, hash of the canonical input); omitted assumptions hash as defaults."""
+        data = company.model_dump()
+        data["assumptions"] = (company.assumptions or DEFAULT_ASSUMPTIONS).model_dump()
+        canonical = json.dumps(data, sort_keys=True, separators=(",", ":"))
+        version = bench_payload.get("fetched_at", "fallback")
+        return company.industry, version, hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _invalidate_results(self, industry: str, year: int) -> None:
+        self.result_cache.invalidate(lambda key: key[0] == industry)
+
     # ----- main entrypoint -----
     def optimize_allocation(self, company: CompanyInput) -> OptimizationResult:
         # 1) Pull priors (+ sources)
         bench_payload = self.gemini_service.gather_platform_benchmarks(company.industry)
+        key = self.result_cache_key(company, bench_payload)
+        result = self.result_cache.get(key)
+        if result is None:
+            result = self.request_stream(company.seed).optimize_with_benchmarks(company, bench_payload)
+            self.result_cache.set(key, result)
+        return result
+
+    def optimize_with_benchmarks(self, company: CompanyInput, bench_payload: Dict[str, Any]) -> OptimizationResult:
+        """CPU-only part of the pipeline, for callers that already fetched the benchmarks."""
         ranges = bench_payload["benchmarks"]
         sources = bench_payload.get("sources", [])
 
-        # 2) Grid search with constraints
-        best_allocation = self.grid_search_optimization(company, ranges)
+        # 2) Search allocations under constraints
+        best_allocation, search_stats = self.search_allocation(company, ranges)
 
         if best_allocation is None:
             best_allocation = self.get_heuristic_allocation(company)
@@ -358,8 +1224,136 @@ class BudgetOptimizer:
             budget_breakdown, company.industry, ranges, company.assumptions
         )
 
+        return self._assemble_result(company, best_allocation, budget_breakdown, platform_results, sources, search_stats)
+
+    def iter_optimize(
+        self, company: CompanyInput, bench_payload: Dict[str, Any], search_chunks: int = STREAM_SEARCH_CHUNKS
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        optimize_with_benchmarks as a stream of stage events for /optimize/stream:
+        "search" (best allocation so far; several per grid search), "platform_results", then "result".
+        """
+        ranges = bench_payload["benchmarks"]
+        table = self._range_table(ranges)
+
+        if self.search_mode == "grid":
+            # Same candidates and shared sample block as grid_search_optimization, scored chunk by chunk
+            candidates = self.feasible_allocations(company)
+            block = self._scoring_block(table)
+            best_allocation, best_score = None, -np.inf
+            search_seconds = 0.0  # time between yields only, so the stage excludes client backpressure
+            for chunk in np.array_split(np.arange(len(candidates)), max(1, min(search_chunks, len(candidates)))):
+                if len(chunk) == 0:
+                    continue
+                start = time.perf_counter()
+                scores = self.batch_score_allocations(candidates[chunk], company, table, block=block)
+                j = int(np.argmax(scores))
+                if scores[j] > best_score:
+                    best_score = float(scores[j])
+                    best_allocation = dict(zip(PLATFORMS, candidates[chunk[j]].tolist()))
+                search_seconds += time.perf_counter() - start
+                yield {
+                    "event": "search",
+                    "evaluated": int(chunk[-1]) + 1,
+                    "total": len(candidates),
+                    "best_allocation": best_allocation,
+                    "expected_score": best_score,
+                }
+            STAGE_LATENCY.observe(search_seconds, "search")
+            search_stats = {"mode": "grid", "evaluated": len(candidates)}
+        else:
+            best_allocation, search_stats = self.search_allocation(company, table)
+            evaluated = search_stats.get("evaluated")
+            yield {"event": "search", "evaluated": evaluated, "total": evaluated, "best_allocation": best_allocation}
+
+        if best_allocation is None:
+            best_allocation = self.get_heuristic_allocation(company)
+
+        budget_breakdown = self.calculate_budget_breakdown(best_allocation, company.budget)
+        platform_results = self.calculate_platform_results(budget_breakdown, company.industry, table)
+        yield {
+            "event": "platform_results",
+            "budget_breakdown": budget_breakdown,
+            "platform_results": platform_results,
+            "total_expected_leads": self.calculate_total_leads(platform_results),
+        }
+
+        yield {
+            "event": "result",
+            "result": self._assemble_result(
+                company, best_allocation, budget_breakdown, platform_results,
+                bench_payload.get("sources", []), search_stats,
+            ),
+        }
+
+    def optimize_batch(
+        self, companies: List[CompanyInput], payloads: Dict[str, Dict[str, Any]]
+    ) -> List[OptimizationResult]:
+        """
+        Optimize many companies against benchmarks pre-fetched per industry, in input order.
+        Companies in the same batch_groups() group share one scoring sample block and one
+        reporting simulation, so a batch costs little more than its distinct industries.
+        """
+        results: List[Optional[OptimizationResult]] = [None] * len(companies)
+        for industry, members, seed, seed_seq in self.batch_groups(companies):
+            group = self.request_stream(seed, seed_seq).optimize_group(
+                [companies[i] for i in members], payloads[industry]
+            )
+            for i, result in zip(members, group):
+                results[i] = result
+        return results
+
+    def batch_groups(
+        self, companies: List[CompanyInput]
+    ) -> List[Tuple[str, List[int], Optional[int], Optional[np.random.SeedSequence]]]:
+        """
+        (industry, member indices, seed, seed_seq) per (industry, company seed) group. Seeded
+        companies run on their own seed; the rest get one stream per group spawned from this
+        optimizer's SeedSequence, so groups are independent and identical wherever they run.
+        """
+        groups: Dict[Tuple[str, Optional[int]], List[int]] = {}
+        for i, company in enumerate(companies):
+            groups.setdefault((company.industry, company.seed), []).append(i)
+        children = self.seed_seq.spawn(len(groups))
+        return [
+            (industry, members, seed, None) if seed is not None else (industry, members, self.seed, child)
+            for ((industry, seed), members), child in zip(groups.items(), children)
+        ]
+
+    def optimize_group(self, companies: List[CompanyInput], payload: Dict[str, Any]) -> List[OptimizationResult]:
+        """Companies sharing an industry's benchmarks, one scoring block and one simulation."""
+        table = self._range_table(payload["benchmarks"])
+        block = self._scoring_block(table)
+
+        searched = [self.search_allocation(company, table, block) for company in companies]
+        allocations = [
+            alloc if alloc is not None else self.get_heuristic_allocation(company)
+            for company, (alloc, _) in zip(companies, searched)
+        ]
+        breakdowns = [
+            self.calculate_budget_breakdown(alloc, company.budget) for company, alloc in zip(companies, allocations)
+        ]
+        platform_results = self.calculate_platform_results_batch(breakdowns, table)
+
+        return [
+            self._assemble_result(
+                company, allocations[k], breakdowns[k], platform_results[k],
+                payload.get("sources", []), searched[k][1],
+            )
+            for k, company in enumerate(companies)
+        ]
+
+    def _assemble_result(
+        self,
+        company: CompanyInput,
+        allocation: Dict[str, float],
+        budget_breakdown: BudgetBreakdown,
+        platform_results: Dict[str, PlatformResult],
+        sources: list,
+        search_stats: Dict[str, Any],
+    ) -> OptimizationResult:
         # 4) Reasoning
-        reasoning = self.generate_reasoning(company, best_allocation, platform_results)
+        reasoning = self.generate_reasoning(company, allocation, platform_results)
 
         # 5) Total leads
         total_expected = self.calculate_total_leads(platform_results)
@@ -375,27 +1369,17 @@ class BudgetOptimizer:
                 "Industry modifiers applied (CTR/CVR ↑, CPM mild adjust)",
                 "Monte Carlo + grid search optimization"
             ],
+            search_stats=search_stats,
+            seed=self.seed,
         )
 
     # ----- grid search -----
-    def generate_allocation_grid(self) -> List[Dict[str, float]]:
-        allocations: List[Dict[str, float]] = []
-        # 10% steps; simple, visible structure
-        for google in range(20, 71, 10):      # 20–70%
-            for meta in range(10, 51, 10):    # 10–50%
-                for linkedin in range(10, 41, 10):  # 10–40%
-                    tiktok = 100 - google - meta - linkedin
-                    if 5 <= tiktok <= 40:
-                        allocations.append({
-                            "google": google / 100,
-                            "meta": meta / 100,
-                            "linkedin": linkedin / 100,
-                            "tiktok": tiktok / 100,
-                        })
-        return allocations
+    def generate_allocation_grid(self, step: int = ALLOCATION_GRID_STEP) -> List[Dict[str, float]]:
+        # Dict view of the precomputed lattice; the search itself works on the matrix
+        return [dict(zip(PLATFORMS, row)) for row in allocation_lattice(step).tolist()]
 
     def meets_constraints(self, allocation: Dict[str, float], company: CompanyInput) -> bool:
-        assumptions = company.assumptions or AssumptionOverrides()
+        assumptions = company.assumptions or DEFAULT_ASSUMPTIONS
         min_linkedin = (assumptions.min_linkedin or 5.0) / 100
         max_google = (assumptions.max_google or 70.0) / 100
 
@@ -421,44 +1405,249 @@ class BudgetOptimizer:
 
     def score_allocation(self, allocation, company, ranges) -> float:
         """
-        Pure Monte Carlo scoring with Gemini-researched benchmarks.
+        Pure Monte Carlo scoring with Gemini-researched benchmarks, or the exact
+        expectation when scoring_mode is "analytic".
         Transparent, reliable, and fully explainable optimization.
         """
+        if self.scoring_mode == "analytic":
+            return self.analytic_score_allocation(allocation, company, ranges)
         return self.monte_carlo_score_allocation(allocation, company, ranges)
 
-    def monte_carlo_score_allocation(self, allocation, company, ranges) -> float:
-        draws = 200
-        total = 0.0
-        for _ in range(draws):
-            score_draw = 0.0
-            for platform, weight in allocation.items():
-                spend = weight * company.budget
-                r = ranges[platform]
-                cpm = self._tri(r["cpm"]["low"], r["cpm"]["mid"], r["cpm"]["high"])
-                ctr = self._tri(r["ctr"]["low"], r["ctr"]["mid"], r["ctr"]["high"])
-                cvr = self._tri(r["cvr"]["low"], r["cvr"]["mid"], r["cvr"]["high"])
-
-                impressions = (spend / max(cpm, 0.01)) * 1000.0
-                clicks = impressions * (ctr / 100.0)
-                leads = clicks * (cvr / 100.0)
-
-                score_draw += leads * self._goal_multiplier(platform, company.goal)
-            total += score_draw
-        return total / draws
+    def monte_carlo_score_allocation(self, allocation, company, ranges, draws: int = MC_SCORE_DRAWS) -> float:
+        leads_per_dollar = self._sample_leads_per_dollar(self._range_table(ranges), draws)
+        weights = self._allocation_matrix([allocation])
+        return float(self._score_draws(leads_per_dollar, weights, company).mean())
+
+    def analytic_score_allocation(self, allocation, company, ranges) -> float:
+        """Closed-form expected score (goal-weighted leads); no sampling."""
+        leads_per_dollar = self._analytic_leads_per_dollar(self._range_table(ranges))[None, :]
+        weights = self._allocation_matrix([allocation])
+        return float(self._score_draws(leads_per_dollar, weights, company)[0, 0])
+
+    def _score_draws(self, leads_per_dollar: np.ndarray, weights: np.ndarray, company: CompanyInput) -> np.ndarray:
+        # (draws x platforms) samples against (candidates x platforms) weights -> (draws x candidates) scores
+        return (leads_per_dollar * self._goal_vector(company.goal)) @ (weights * company.budget).T
+
+    @staticmethod
+    def _expected_scores(block: np.ndarray, goal: np.ndarray, budget: float, weights: np.ndarray) -> np.ndarray:
+        """
+        Mean over the block's draws of each row's score. Scores are linear in the draws, so the
+        mean draw is taken first (one pass over the block instead of one per candidate), then
+        each row gets the same elementwise weighted sum: a candidate's score never depends on
+        which other rows it is scored with, so chunked and whole-set scoring agree bit for bit.
+        """
+        # C order so the mean reduces in the same order whatever layout the block arrived in
+        coef = (np.ascontiguousarray(block) * goal).mean(axis=0) * budget
+        return (weights * coef).sum(axis=1)
+
+    def batch_score_allocations(
+        self,
+        weights: np.ndarray,
+        company: CompanyInput,
+        ranges,
+        draws: int = MC_SCORE_DRAWS,
+        block: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Expected score of every allocation row, evaluated in one vectorized pass.
+        All candidates share the same sample block (common random numbers), so
+        differences between scores reflect the allocations rather than the luck of the draw.
+        In analytic scoring mode the single exact expectation row replaces the draws.
+        Pass `block` to reuse a sample block across calls (e.g. every company in a batch).
+        """
+        leads_per_dollar = block if block is not None else self._scoring_block(self._range_table(ranges), draws)
+        return self._expected_scores(leads_per_dollar, self._goal_vector(company.goal), company.budget, weights)
 
 # ML methods removed - using pure Monte Carlo + Gemini for transparency and reliability
 
+    @staticmethod
+    def _allocation_matrix(allocations: List[Dict[str, float]]) -> np.ndarray:
+        return np.array([[a.get(p, 0.0) for p in PLATFORMS] for a in allocations]).reshape(-1, len(PLATFORMS))
+
+    def feasible_allocations(self, company: CompanyInput, step: int = ALLOCATION_GRID_STEP) -> np.ndarray:
+        """Lattice candidates that pass meets_constraints, as a read-only (candidates x platforms) weight matrix."""
+        lower, upper, social_floor = self.allocation_limits(company)
+        return _feasible_lattice(step, tuple(lower.tolist()), tuple(upper.tolist()), social_floor)
+
     def grid_search_optimization(self, company: CompanyInput, ranges: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, float]]:
-        best_score = -1.0
-        best_alloc = None
-        for alloc in self.generate_allocation_grid():
-            if not self.meets_constraints(alloc, company):
-                continue
-            score = self.score_allocation(alloc, company, ranges)
-            if score > best_score:
-                best_score = score
-                best_alloc = alloc
-        return best_alloc
+        return self._grid_search(company, ranges)[0]
+
+    def _grid_search(
+        self, company: CompanyInput, ranges: Dict[str, Dict[str, Any]], block: Optional[np.ndarray] = None
+    ) -> Tuple[Optional[Dict[str, float]], int]:
+        candidates = self.feasible_allocations(company)
+        if len(candidates) == 0:
+            return None, 0
+        scores = self.batch_score_allocations(candidates, company, ranges, block=block)
+        return dict(zip(PLATFORMS, candidates[int(np.argmax(scores))].tolist())), len(candidates)
+
+    @timed_stage("search")
+    def search_allocation(
+        self, company: CompanyInput, ranges: Dict[str, Dict[str, Any]], block: Optional[np.ndarray] = None
+    ) -> Tuple[Optional[Dict[str, float]], Dict[str, Any]]:
+        """
+        Best allocation under the configured search mode, plus stats on how it was found.
+        `block` optionally supplies a shared scoring sample block; racing always draws its own.
+        """
+        if self.search_mode == "continuous":
+            alloc = self.continuous_optimization(company, ranges, block)
+            if alloc is not None:
+                return alloc, {"mode": "continuous"}
+        elif self.search_mode == "refine":
+            alloc, evaluated = self.refine_search_optimization(company, ranges, block)
+            return alloc, {"mode": "refine", "evaluated": sum(evaluated.values()), "evaluated_per_level": evaluated}
+        elif self.search_mode == "racing":
+            alloc, stats = self.racing_search_optimization(company, ranges)
+            return alloc, {"mode": "racing", **stats}
+        alloc, evaluated = self._grid_search(company, ranges, block)
+        return alloc, {"mode": "grid", "evaluated": evaluated}
+
+    def racing_search_optimization(
+        self, company: CompanyInput, ranges: Dict[str, Dict[str, Any]]
+    ) -> Tuple[Optional[Dict[str, float]], Dict[str, Any]]:
+        """
+        Successive halving over the feasible grid. Each round scores the survivors on a fresh
+        shared sample block, drops every candidate whose paired difference to the leader is
+        significantly negative (and at least the bottom half), then doubles the draws.
+        """
+        candidates = self.feasible_allocations(company)
+        if len(candidates) == 0:
+            return None, {"evaluated": 0, "rounds": 0, "candidate_draws": 0}
+
+        table = self._range_table(ranges)
+        alive = np.arange(len(candidates))
+        history = np.empty((0, len(candidates)))  # per-draw scores; columns follow `alive`
+        draws, rounds, candidate_draws = RACING_INITIAL_DRAWS, 0, 0
+        while len(alive) > 1:
+            block = self._score_draws(self._sample_leads_per_dollar(table, draws), candidates[alive], company)
+            history = np.vstack([history, block])
+            candidate_draws += draws * len(alive)
+            rounds += 1
+
+            means = history.mean(axis=0)
+            leader = int(np.argmax(means))
+            # Common random numbers make paired differences far tighter than the raw scores
+            diff = history[:, [leader]] - history
+            se = diff.std(axis=0, ddof=1) / np.sqrt(len(history))
+            plausible = np.flatnonzero(diff.mean(axis=0) - RACING_Z * se <= 0)
+            keep = plausible[np.argsort(-means[plausible], kind="stable")][: (len(alive) + 1) // 2]
+
+            alive, history = alive[keep], history[:, keep]
+            draws *= 2
+
+        best = dict(zip(PLATFORMS, candidates[alive[0]].tolist()))
+        return best, {
+            "evaluated": len(candidates),
+            "rounds": rounds,
+            "candidate_draws": candidate_draws,
+            "grid_candidate_draws": len(candidates) * MC_SCORE_DRAWS,
+        }
+
+    def refine_search_optimization(
+        self, company: CompanyInput, ranges: Dict[str, Dict[str, Any]], block: Optional[np.ndarray] = None
+    ) -> Tuple[Optional[Dict[str, float]], Dict[str, int]]:
+        """
+        Coarse-to-fine search: score the 10% grid, keep the REFINE_TOP_K best cells, then
+        rescore their neighbourhoods at each finer step in REFINE_STEPS. Every level is
+        rechecked against meets_constraints and scored on one shared sample block.
+        Returns the best allocation and the number of new candidates scored per level.
+        """
+        leads_per_dollar = block if block is not None else self._scoring_block(self._range_table(ranges))
+        scored: Dict[Tuple[int, ...], float] = {}
+        evaluated: Dict[str, int] = {}
+
+        # Work in integer percentage points so neighbourhoods line up exactly between levels
+        frontier = np.rint(self.feasible_allocations(company, step=REFINE_STEPS[0]) * 100).astype(int)
+        prev_step = REFINE_STEPS[0]
+        for level, step in enumerate(REFINE_STEPS):
+            if level > 0:
+                best = np.array(sorted(scored, key=scored.get, reverse=True)[:REFINE_TOP_K], dtype=int)
+                frontier = self._refine_neighbourhood(best.reshape(-1, len(PLATFORMS)), prev_step, step, company)
+            fresh = np.array([c for c in frontier.tolist() if tuple(c) not in scored], dtype=int).reshape(-1, len(PLATFORMS))
+            if len(fresh):
+                scores = self.batch_score_allocations(fresh / 100.0, company, None, block=leads_per_dollar)
+                scored.update(zip(map(tuple, fresh.tolist()), scores.tolist()))
+            evaluated[f"{step}%"] = len(fresh)
+            prev_step = step
+
+        if not scored:
+            return None, evaluated
+        best = max(scored, key=scored.get)
+        return dict(zip(PLATFORMS, [v / 100.0 for v in best])), evaluated
+
+    def _refine_neighbourhood(self, cells: np.ndarray, prev_step: int, step: int, company: CompanyInput) -> np.ndarray:
+        # Offsets finer than the previous level's spacing, applied to every platform but tiktok,
+        # which takes the remainder (same parameterization as generate_allocation_grid)
+        offsets = [k * step for k in range(-(prev_step // step), prev_step // step + 1) if abs(k * step) < prev_step]
+        free = [PLATFORMS.index(p) for p in PLATFORMS if p != "tiktok"]
+        t = PLATFORMS.index("tiktok")
+        lower = np.array([round(ALLOCATION_BOUNDS[p][0] * 100) for p in PLATFORMS])
+        upper = np.array([round(ALLOCATION_BOUNDS[p][1] * 100) for p in PLATFORMS])
+
+        delta = np.zeros((len(offsets) ** len(free), len(PLATFORMS)), dtype=int)
+        delta[:, free] = list(itertools.product(offsets, repeat=len(free)))
+        points = (cells[:, None, :] + delta[None, :, :]).reshape(-1, len(PLATFORMS))
+        points[:, t] = 100 - points[:, free].sum(axis=1)
+        points = points[np.all((points >= lower) & (points <= upper), axis=1)]
+        return points[constraint_mask(points / 100.0, *self.allocation_limits(company))]
+
+    def allocation_limits(self, company: CompanyInput) -> Tuple[np.ndarray, np.ndarray, float]:
+        """meets_constraints as per-platform (lower, upper) share bounds plus the meta+tiktok floor."""
+        assumptions = company.assumptions or DEFAULT_ASSUMPTIONS
+        lower = np.array([ALLOCATION_BOUNDS[p][0] for p in PLATFORMS])
+        upper = np.array([ALLOCATION_BOUNDS[p][1] for p in PLATFORMS])
+        g, li = PLATFORMS.index("google"), PLATFORMS.index("linkedin")
+
+        lower[li] = max(lower[li], (assumptions.min_linkedin or 5.0) / 100)
+        upper[g] = min(upper[g], (assumptions.max_google or 70.0) / 100)
+        lower[g] = max(lower[g], 0.15)
+        if company.industry == "b2b_saas":
+            lower[li] = max(lower[li], 0.15)
+
+        social_floor = 0.40 if assumptions.prefer_social or company.industry == "ecommerce" else 0.0
+        return lower, upper, social_floor
+
+    def _expected_leads_per_dollar(
+        self, ranges, draws: int = MC_SCORE_DRAWS, block: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        if block is None:
+            block = self._scoring_block(self._range_table(ranges), draws)
+        return block.mean(axis=0)
+
+    def continuous_optimization(
+        self, company: CompanyInput, ranges: Dict[str, Dict[str, Any]], block: Optional[np.ndarray] = None
+    ) -> Optional[Dict[str, float]]:
+        """
+        Exact linear program over the 4-platform simplex with the meets_constraints limits.
+        Expected score is linear in the weights, so HiGHS returns the optimal vertex rather than
+        the nearest 10% grid point, and never scores below the grid. Returns None if the
+        constraints cannot be met.
+        """
+        from scipy.optimize import linprog  # only this search mode needs scipy
+
+        lower, upper, social_floor = self.allocation_limits(company)
+        if np.any(lower > upper) or lower.sum() > 1.0 or upper.sum() < 1.0:
+            return None
+
+        coef = self._expected_leads_per_dollar(ranges, block=block) * self._goal_vector(company.goal) * company.budget
+        social = np.array([1.0 if p in SOCIAL_PLATFORMS else 0.0 for p in PLATFORMS])
+        res = linprog(
+            -coef,
+            A_ub=-social[None, :] if social_floor > 0 else None,
+            b_ub=[-social_floor] if social_floor > 0 else None,
+            A_eq=np.ones((1, len(PLATFORMS))),
+            b_eq=[1.0],
+            bounds=list(zip(lower, upper)),
+            method="highs",
+        )
+        if not res.success:
+            return None
+
+        # 0.01% precision; push the rounding residue onto the largest share so weights sum to 1
+        weights = np.round(np.clip(res.x, lower, upper), 4)
+        weights[int(np.argmax(weights))] += 1.0 - weights.sum()
+        alloc = dict(zip(PLATFORMS, weights.tolist()))
+        return alloc if self.meets_constraints(alloc, company) else None
 
     # ----- heuristics & weights -----
     def get_base_weights(self) -> Dict[str, float]:
@@ -510,48 +1699,47 @@ class BudgetOptimizer:
         industry: str,
         ranges: Dict[str, Dict[str, Any]],
         assumptions: Optional[AssumptionOverrides] = None,
+        draws: int = MC_REPORT_DRAWS,
     ) -> Dict[str, PlatformResult]:
-        results: Dict[str, PlatformResult] = {}
-        total_budget = budget_breakdown.google + budget_breakdown.meta + budget_breakdown.tiktok + budget_breakdown.linkedin
-
-        # draws for per-channel intervals
-        draws = 1000
-        for platform in ["google", "meta", "tiktok", "linkedin"]:
-            p_budget = getattr(budget_breakdown, platform)
-            pct = (p_budget / total_budget) * 100.0 if total_budget > 0 else 0.0
-            r = ranges[platform]
-
-            leads_samples: List[float] = []
-            cpl_samples: List[float] = []
-
-            for _ in range(draws):
-                cpm = self._tri(r["cpm"]["low"], r["cpm"]["mid"], r["cpm"]["high"])
-                ctr = self._tri(r["ctr"]["low"], r["ctr"]["mid"], r["ctr"]["high"])
-                cvr = self._tri(r["cvr"]["low"], r["cvr"]["mid"], r["cvr"]["high"])
-
-                impressions = (p_budget / max(cpm, 0.01)) * 1000.0
-                clicks = impressions * (ctr / 100.0)
-                leads = clicks * (cvr / 100.0)
-                cpl = p_budget / max(leads, 1e-6)
-
-                leads_samples.append(leads)
-                cpl_samples.append(cpl)
-
-            results[platform] = PlatformResult(
-                budget=p_budget,
-                percentage=pct,
-                expected_leads=ConfidenceRange(
-                    p10=self._pct(leads_samples, 10),
-                    p50=self._pct(leads_samples, 50),
-                    p90=self._pct(leads_samples, 90),
-                ),
-                cost_per_lead=ConfidenceRange(
-                    p10=self._pct(cpl_samples, 10),
-                    p50=self._pct(cpl_samples, 50),
-                    p90=self._pct(cpl_samples, 90),
-                ),
-            )
-        return results
+        return self.calculate_platform_results_batch([budget_breakdown], ranges, draws)[0]
+
+    @timed_stage("platform_results")
+    def calculate_platform_results_batch(
+        self,
+        budget_breakdowns: List[BudgetBreakdown],
+        ranges: Dict[str, Dict[str, Any]],
+        draws: int = MC_REPORT_DRAWS,
+    ) -> List[Dict[str, PlatformResult]]:
+        """Platform results for several breakdowns that share the same priors and one simulation."""
+        budgets = np.array([[getattr(b, p) for p in PLATFORMS] for b in budget_breakdowns])  # (breakdowns x platforms)
+        totals = budgets.sum(axis=1)
+
+        # One (draws x platforms) simulation, then every P10/P50/P90 in a single quantile pass
+        leads_per_dollar = self._sample_leads_per_dollar(self._range_table(ranges), draws)
+        leads = leads_per_dollar[None, :, :] * budgets[:, None, :]  # (breakdowns x draws x platforms)
+        cpl = budgets[:, None, :] / np.maximum(leads, 1e-6)
+        bands = np.percentile(np.concatenate([leads, cpl], axis=2), [10, 50, 90], axis=1)
+        n = len(PLATFORMS)
+
+        batch: List[Dict[str, PlatformResult]] = []
+        for b in range(len(budget_breakdowns)):
+            leads_q, cpl_q = bands[:, b, :n], bands[:, b, n:]
+            results: Dict[str, PlatformResult] = {}
+            for i, platform in enumerate(PLATFORMS):
+                p_budget = float(budgets[b, i])
+                pct = (p_budget / totals[b]) * 100.0 if totals[b] > 0 else 0.0
+                results[platform] = PlatformResult(
+                    budget=p_budget,
+                    percentage=pct,
+                    expected_leads=ConfidenceRange(
+                        p10=float(leads_q[0, i]), p50=float(leads_q[1, i]), p90=float(leads_q[2, i])
+                    ),
+                    cost_per_lead=ConfidenceRange(
+                        p10=float(cpl_q[0, i]), p50=float(cpl_q[1, i]), p90=float(cpl_q[2, i])
+                    ),
+                )
+            batch.append(results)
+        return batch
 
     def calculate_total_leads(self, platform_results: Dict[str, PlatformResult]) -> ConfidenceRange:
         return ConfidenceRange(
@@ -560,6 +1748,7 @@ class BudgetOptimizer:
             p90=sum(r.expected_leads.p90 for r in platform_results.values()),
         )
 
+    @timed_stage("reasoning")
     def generate_reasoning(self, company: CompanyInput, weights: Dict[str, float], results: Dict[str, PlatformResult]) -> str:
         reasoning = f"Budget allocation for {company.name} (${company.budget:,.0f}/month, Goal: {company.goal}):\n\n"
         
@@ -633,11 +1822,105 @@ LEOADS_CLIENTS = [
     {"name": "GlobalFlow Retail", "budget": 75000, "goal": "revenue", "industry": "ecommerce", "description": "International retail chain"}
 ]
 
+# ----------------------------
+# Process pool for the optimization core
+# ----------------------------
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+# Workers return their stage timings alongside the result so /metrics in the parent sees them
+# Seeds are resolved in the parent, so a request gives the same result inline or in any worker
+def _optimize_in_worker(
+    company_data: Dict[str, Any], table: np.ndarray, sources: list, seed: int
+) -> Tuple[OptimizationResult, Dict[Tuple[str, ...], List[float]]]:
+    STAGE_LATENCY.reset()
+    company = CompanyInput(**company_data)
+    stream = optimizer.request_stream(seed)
+    result = stream.optimize_with_benchmarks(company, {"benchmarks": table, "sources": sources})
+    return result, STAGE_LATENCY.snapshot()
+
+def _optimize_group_in_worker(
+    company_data: List[Dict[str, Any]],
+    table: np.ndarray,
+    sources: list,
+    seed: Optional[int],
+    seed_seq: Optional[np.random.SeedSequence],
+) -> Tuple[List[OptimizationResult], Dict[Tuple[str, ...], List[float]]]:
+    STAGE_LATENCY.reset()
+    companies = [CompanyInput(**d) for d in company_data]
+    stream = optimizer.request_stream(seed, seed_seq)
+    results = stream.optimize_group(companies, {"benchmarks": table, "sources": sources})
+    return results, STAGE_LATENCY.snapshot()
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    global _process_pool
+    if OPTIMIZER_PROCESS_WORKERS <= 0:
+        return None
+    with _process_pool_lock:
+        if _process_pool is None:
+            # Spawn, not fork: forking while a Gemini, executor or logging thread holds a lock
+            # (STAGE_LATENCY's, the seed lock, a handler's) would leave the worker deadlocked
+            _process_pool = ProcessPoolExecutor(
+                max_workers=OPTIMIZER_PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+async def run_optimization(company: CompanyInput, bench_payload: Dict[str, Any]) -> OptimizationResult:
+    """Run the CPU part of /optimize inline, or in the process pool when OPTIMIZER_PROCESS_WORKERS > 0."""
+    stream = optimizer.request_stream(company.seed)
+    pool = get_process_pool()
+    if pool is None:
+        return stream.optimize_with_benchmarks(company, bench_payload)
+    # Ship the compact (platform, metric, band) array rather than the nested range dicts
+    table = BudgetOptimizer._range_table(bench_payload["benchmarks"])
+    loop = asyncio.get_running_loop()
+    result, stages = await loop.run_in_executor(
+        pool, _optimize_in_worker, company.model_dump(), table, bench_payload.get("sources", []), stream.seed
+    )
+    STAGE_LATENCY.merge(stages)
+    return result
+
+async def run_batch_optimization(
+    companies: List[CompanyInput], payloads: Dict[str, Dict[str, Any]], seed: Optional[int] = None
+) -> List[OptimizationResult]:
+    """Batch counterpart of run_optimization; with a process pool each batch group runs in its own worker."""
+    stream = optimizer.request_stream(seed)
+    pool = get_process_pool()
+    loop = asyncio.get_running_loop()
+    if pool is None:
+        # A full batch is hundreds of ms of CPU; keep it on a worker thread, off the event loop
+        return await loop.run_in_executor(None, stream.optimize_batch, companies, payloads)
+
+    groups = stream.batch_groups(companies)
+    tasks = [
+        loop.run_in_executor(
+            pool,
+            _optimize_group_in_worker,
+            [companies[i].model_dump() for i in members],
+            BudgetOptimizer._range_table(payloads[industry]["benchmarks"]),
+            payloads[industry].get("sources", []),
+            group_seed,
+            seed_seq,
+        )
+        for industry, members, group_seed, seed_seq in groups
+    ]
+    results: List[Optional[OptimizationResult]] = [None] * len(companies)
+    for (_, members, _, _), (group, stages) in zip(groups, await asyncio.gather(*tasks)):
+        STAGE_LATENCY.merge(stages)
+        for i, result in zip(members, group):
+            results[i] = result
+    return results
+
 # ----------------------------
 # FastAPI routes
 # ----------------------------
 optimizer = BudgetOptimizer()
 
+@app.on_event("shutdown")
+def shutdown_process_pool():
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+
 @app.get("/")
 async def root():
     return {"message": "Budget Brain API is running! 🧠"}
@@ -657,16 +1940,121 @@ async def debug_cors(request):
         "url": str(request.url)
     }
 
+def profiling_requested(request: Request) -> bool:
+    """True when the caller asked for a profile with the right token; 403 for a wrong or disabled one."""
+    token = request.headers.get("x-profile-token") or request.query_params.get("profile")
+    if not token:
+        return False
+    if not PROFILING_TOKEN or not hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Profiling not permitted")
+    return True
+
+async def run_profiled_optimization(company: CompanyInput) -> OptimizationResult:
+    """
+    The full /optimize pipeline (benchmarks included) on a thread of its own under SamplingProfiler.
+    Skips the result cache and process pool so the profile shows the real work.
+    """
+    def pipeline() -> OptimizationResult:
+        bench_payload = optimizer.gemini_service.gather_platform_benchmarks(company.industry)
+        return optimizer.request_stream(company.seed).optimize_with_benchmarks(company, bench_payload)
+
+    profiler = SamplingProfiler()
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, profiler.run, pipeline)
+    return result.model_copy(update={"profile": profiler.report()})
+
 @app.post("/optimize", response_model=OptimizationResult)
-async def optimize_budget(company: CompanyInput):
+async def optimize_budget(company: CompanyInput, request: Request):
+    profile = profiling_requested(request)
     try:
-        # Add CORS headers explicitly for debugging
-        print(f"Received optimization request for {company.name} with budget ${company.budget}")
-        response = optimizer.optimize_allocation(company)
-        print(f"Optimization completed successfully for {company.name}")
+        if profile:
+            logger.info("Profiling optimization request for %s", company.name)
+            return await run_profiled_optimization(company)
+        logger.debug("Received optimization request for %s with budget $%s", company.name, company.budget)
+        bench_payload = await optimizer.gemini_service.agather_platform_benchmarks(company.industry)
+        key = optimizer.result_cache_key(company, bench_payload)
+        response = optimizer.result_cache.get(key)
+        if response is None:
+            response = await run_optimization(company, bench_payload)
+            optimizer.result_cache.set(key, response)
+        logger.debug("Optimization completed successfully for %s", company.name)
         return response
     except Exception as e:
-        print(f"Error in optimization: {str(e)}")
+        logger.exception(f"Error in optimization: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _ndjson(event: Dict[str, Any]) -> str:
+    return json.dumps(jsonable_encoder(event)) + "\n"
+
+@app.post("/optimize/stream")
+async def optimize_budget_stream(company: CompanyInput):
+    """
+    /optimize as newline-delimited JSON events: "benchmarks", "search" (best allocation so far),
+    "platform_results", then "result" with the full OptimizationResult ("error" on failure).
+    Always runs in-process so events can be emitted between stages; each stage is advanced
+    on a worker thread so search and simulation never block the event loop.
+    """
+    async def events():
+        try:
+            bench_payload = await optimizer.gemini_service.agather_platform_benchmarks(company.industry)
+            yield _ndjson({
+                "event": "benchmarks",
+                "industry": company.industry,
+                "benchmarks": bench_payload["benchmarks"],
+                "sources": bench_payload.get("sources", []),
+            })
+
+            key = optimizer.result_cache_key(company, bench_payload)
+            cached = optimizer.result_cache.get(key)
+            if cached is not None:
+                yield _ndjson({"event": "result", "result": cached})
+                return
+
+            stages = optimizer.request_stream(company.seed).iter_optimize(company, bench_payload)
+            loop = asyncio.get_running_loop()
+            while True:
+                event = await loop.run_in_executor(None, next, stages, None)
+                if event is None:
+                    break
+                if event["event"] == "result":
+                    optimizer.result_cache.set(key, event["result"])
+                yield _ndjson(event)
+        except Exception as e:
+            logger.exception(f"Error in streaming optimization: {str(e)}")
+            yield _ndjson({"event": "error", "detail": str(e)})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/optimize/batch", response_model=List[OptimizationResult])
+async def optimize_budget_batch(companies: List[CompanyInput], seed: Optional[int] = Query(None, ge=0)):
+    """Optimize many companies in one call; results come back in input order. ?seed= makes the batch reproducible."""
+    if len(companies) > OPTIMIZE_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {OPTIMIZE_BATCH_MAX_SIZE} companies)")
+    try:
+        logger.debug("Received batch optimization request for %d companies", len(companies))
+        # Benchmarks once per distinct industry, fetched concurrently
+        industries = list(dict.fromkeys(c.industry for c in companies))
+        fetched = await asyncio.gather(
+            *[optimizer.gemini_service.agather_platform_benchmarks(industry) for industry in industries]
+        )
+        payloads = dict(zip(industries, fetched))
+
+        # Seeded batches skip cached results: batch_groups spawns one stream per group, so only
+        # the full batch in input order rebuilds the same groups (and results) on every call
+        results = [
+            optimizer.result_cache.get(optimizer.result_cache_key(c, payloads[c.industry])) if seed is None else None
+            for c in companies
+        ]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            # Not written back: a batch result echoes its group's stream seed, which only reproduces
+            # it inside the same batch, so a later /optimize must not be served it
+            computed = await run_batch_optimization([companies[i] for i in missing], payloads, seed)
+            for i, result in zip(missing, computed):
+                results[i] = result
+        return results
+    except Exception as e:
+        logger.exception(f"Error in batch optimization: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/benchmarks")
@@ -692,10 +2080,25 @@ async def get_client_examples():
         "total_examples": len(LEOADS_CLIENTS)
     }
 
+@app.get("/benchmarks/cache")
+async def get_benchmark_cache_stats():
+    """Hit/miss counters for the researched-benchmark and /optimize result caches"""
+    return {
+        "benchmarks": optimizer.gemini_service.cache.stats(),
+        "results": optimizer.result_cache.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition: stage and route latency histograms, cache and Gemini counters"""
+    lines = STAGE_LATENCY.render() + ROUTE_LATENCY.render() + GEMINI_CALLS.render() + BENCHMARK_FALLBACKS.render()
+    lines += _cache_metrics({"benchmarks": optimizer.gemini_service.cache, "results": optimizer.result_cache})
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
 @app.post("/research/{industry}")
 async def research_industry_benchmarks(industry: str):
     try:
-        payload = optimizer.gemini_service.gather_platform_benchmarks(industry)
+        payload = await optimizer.gemini_service.agather_platform_benchmarks(industry)
         return {
             "industry": industry,
             "benchmarks": payload["benchmarks"],
@@ -708,7 +2111,7 @@ async def research_industry_benchmarks(industry: str):
 @app.post("/explain-allocation")
 async def explain_allocation(data: dict):
     try:
-        svc = GeminiResearchService()
+        svc = optimizer.gemini_service
         if not svc.model:
             return {"explanation": "Gemini API not available for detailed explanations"}
 
@@ -731,8 +2134,8 @@ Allocation:
 
 Explain using platform strengths and typical audience behavior. Avoid fluff. No bullet points.
 """
-        resp = svc.model.generate_content(prompt)
-        return {"explanation": resp.text if resp else "Unable to generate explanation"}
+        text = await svc.agenerate_text(prompt)
+        return {"explanation": text or "Unable to generate explanation"}
     except Exception as e:
         return {"explanation": f"Error generating explanation: {str(e)}"}
 
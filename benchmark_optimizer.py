@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Budget Brain Optimizer Micro-Benchmarks
+Times each BudgetOptimizer stage in-process, for every LEOADS_CLIENTS example
+
+Stages: grid generation, constraint filtering (the uncached lattice mask),
+candidate scoring, the configured search, platform results, reasoning and the
+full CPU pipeline (optimize_with_benchmarks). Priors are the offline
+_get_fallback_ranges() with each industry's modifiers applied, and every stage is
+reseeded before it is timed, so runs are reproducible and need no server or Gemini key.
+
+Usage:
+    python benchmark_optimizer.py [--repeats 30] [--json timings.json]
+    python benchmark_optimizer.py --baseline timings.json   # exit 1 on regressions
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import numpy as np  # noqa: E402
+from main import LEOADS_CLIENTS, BudgetOptimizer, CompanyInput, allocation_lattice, constraint_mask  # noqa: E402
+
+STAGES = ["grid", "constraints", "scoring", "search", "platform_results", "reasoning", "pipeline"]
+
+
+def time_call(fn, repeats: int, warmup: int) -> dict:
+    """Wall-time statistics (ms) of fn() over `repeats` calls after `warmup` untimed ones."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - start) / 1e6)
+    samples.sort()
+    return {
+        "repeats": repeats,
+        "min_ms": samples[0],
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.fmean(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+    }
+
+
+def benchmark_client(client: dict, args) -> list:
+    optimizer = BudgetOptimizer(
+        seed=args.seed, search_mode=args.search_mode, scoring_mode=args.scoring_mode, sampler=args.sampler
+    )
+    service = optimizer.gemini_service
+    company = CompanyInput(**{k: client[k] for k in ("name", "budget", "goal", "industry")})
+    ranges = service._apply_industry_modifiers_to_ranges(service._get_fallback_ranges(), company.industry)
+    payload = {"benchmarks": ranges, "sources": []}
+    table = optimizer._range_table(ranges)
+
+    # Inputs for the downstream stages, computed once outside the timed region
+    candidates = optimizer.feasible_allocations(company)
+    allocation, _ = optimizer.search_allocation(company, table)
+    allocation = allocation or optimizer.get_heuristic_allocation(company)
+    breakdown = optimizer.calculate_budget_breakdown(allocation, company.budget)
+    platform_results = optimizer.calculate_platform_results(breakdown, company.industry, table)
+
+    calls = {
+        "grid": lambda: optimizer.generate_allocation_grid(),
+        # The mask itself: feasible_allocations caches per constraint set, so it would only time a hit
+        "constraints": lambda: constraint_mask(allocation_lattice(), *optimizer.allocation_limits(company)),
+        "scoring": lambda: optimizer.batch_score_allocations(candidates, company, table),
+        "search": lambda: optimizer.search_allocation(company, table),
+        "platform_results": lambda: optimizer.calculate_platform_results(breakdown, company.industry, table),
+        "reasoning": lambda: optimizer.generate_reasoning(company, allocation, platform_results),
+        "pipeline": lambda: optimizer.optimize_with_benchmarks(company, payload),
+    }
+
+    rows = []
+    for stage in args.stages:
+        optimizer.rng = np.random.default_rng(args.seed)
+        row = {"stage": stage, "client": client["name"], "industry": client["industry"], "goal": client["goal"]}
+        row.update(time_call(calls[stage], args.repeats, args.warmup))
+        if stage == "pipeline":
+            # Seeded, so a changed allocation here is a behaviour change, not noise
+            optimizer.rng = np.random.default_rng(args.seed)
+            row["allocation"] = optimizer.optimize_with_benchmarks(company, payload).budget_breakdown.model_dump()
+        rows.append(row)
+    return rows
+
+
+def compare(rows: list, baseline_path: str, threshold: float, min_delta_ms: float) -> int:
+    """Print median ratios against a previous --json run; returns how many stages regressed."""
+    with open(baseline_path) as f:
+        baseline = {(r["stage"], r["client"]): r for r in json.load(f)["results"]}
+
+    regressions = 0
+    print(f"\n📈 Against {baseline_path} (regression = median > {threshold:.2f}x baseline)\n")
+    print(f"{'stage':<17} {'client':<22} {'baseline ms':>12} {'now ms':>10} {'ratio':>7}")
+    for r in rows:
+        base = baseline.get((r["stage"], r["client"]))
+        if base is None:
+            continue
+        ratio = r["median_ms"] / base["median_ms"] if base["median_ms"] > 0 else float("inf")
+        flag = ""
+        if ratio > threshold and r["median_ms"] - base["median_ms"] > min_delta_ms:
+            regressions += 1
+            flag = "  ⚠️ slower"
+        if "allocation" in r and "allocation" in base and r["allocation"] != base["allocation"]:
+            flag += "  ⚠️ allocation changed"
+        print(f"{r['stage']:<17} {r['client'][:22]:<22} {base['median_ms']:>12.3f} {r['median_ms']:>10.3f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=30, help="timed calls per stage and client")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed calls before timing")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--search-mode", help="override OPTIMIZER_SEARCH_MODE")
+    parser.add_argument("--scoring-mode", help="override OPTIMIZER_SCORING_MODE")
+    parser.add_argument("--sampler", help="override MC_SAMPLER")
+    parser.add_argument("--json", help="write machine-readable timings to this file")
+    parser.add_argument("--baseline", help="compare against timings from an earlier --json run")
+    parser.add_argument("--threshold", type=float, default=1.25, help="median ratio counted as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.02, help="ignore slowdowns smaller than this (timer noise)")
+    args = parser.parse_args()
+
+    print(f"⏱️  Benchmarking {len(args.stages)} stages x {len(LEOADS_CLIENTS)} clients ({args.repeats} repeats each)\n")
+    rows = []
+    for client in LEOADS_CLIENTS:
+        rows.extend(benchmark_client(client, args))
+
+    summary = {}
+    print(f"{'stage':<17} {'median ms':>10} {'p95 ms':>10} {'max client median':>18}")
+    for stage in args.stages:
+        stage_rows = [r for r in rows if r["stage"] == stage]
+        summary[stage] = {
+            "median_ms": statistics.median(r["median_ms"] for r in stage_rows),
+            "p95_ms": statistics.median(r["p95_ms"] for r in stage_rows),
+            "max_median_ms": max(r["median_ms"] for r in stage_rows),
+        }
+        s = summary[stage]
+        print(f"{stage:<17} {s['median_ms']:>10.3f} {s['p95_ms']:>10.3f} {s['max_median_ms']:>18.3f}")
+
+    probe = BudgetOptimizer(search_mode=args.search_mode, scoring_mode=args.scoring_mode, sampler=args.sampler)
+    report = {
+        "meta": {
+            "seed": args.seed,
+            "repeats": args.repeats,
+            "warmup": args.warmup,
+            "search_mode": probe.search_mode,
+            "scoring_mode": probe.scoring_mode,
+            "sampler": probe.sampler,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "summary": summary,
+        "results": rows,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Timings written to {args.json}")
+
+    if args.baseline:
+        regressions = compare(rows, args.baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ {regressions} stage timings regressed")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
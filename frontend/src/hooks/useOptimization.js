@@ -1,6 +1,63 @@
 import { useState, useCallback } from 'react';
 import axios from 'axios';
 
+// Progress bar position for each /optimize/stream event (search events fill the range in between)
+const STREAM_PROGRESS = { benchmarks: 30, search: 85, platform_results: 90, result: 100 };
+
+// POST /optimize/stream and read its NDJSON events, reporting progress as stages complete.
+// Resolves with the final OptimizationResult.
+const streamOptimization = async (requestData, onProgress) => {
+  let response;
+  try {
+    response = await fetch(`${axios.defaults.baseURL || ''}/optimize/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(requestData)
+    });
+  } catch (err) {
+    err.streamUnavailable = true;
+    throw err;
+  }
+  if (response.status === 404 || response.status === 405 || !response.body) {
+    throw Object.assign(new Error('Streaming unavailable'), { streamUnavailable: true });
+  }
+  if (!response.ok) {
+    const body = await response.json().catch(() => ({}));
+    throw new Error(body.detail || 'Error optimizing budget');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result = null;
+
+  const handleLine = (line) => {
+    if (!line.trim()) return;
+    const event = JSON.parse(line);
+    if (event.event === 'error') throw new Error(event.detail);
+    if (event.event === 'search' && event.total) {
+      const { benchmarks, search } = STREAM_PROGRESS;
+      onProgress(Math.round(benchmarks + (search - benchmarks) * (event.evaluated / event.total)));
+    } else if (STREAM_PROGRESS[event.event]) {
+      onProgress(STREAM_PROGRESS[event.event]);
+    }
+    if (event.event === 'result') result = event.result;
+  };
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer);
+
+  if (!result) throw new Error('Optimization stream ended without a result');
+  return result;
+};
+
 export const useOptimization = () => {
   const [results, setResults] = useState(null);
   const [loading, setLoading] = useState(false);
@@ -16,34 +73,36 @@ export const useOptimization = () => {
     setResults(null);
     setEnhancedExplanation(null);
 
-    try {
-      // Simulate progress for UX
-      const progressInterval = setInterval(() => {
-        setOptimizationProgress(prev => Math.min(prev + 10, 90));
-      }, 200);
-
-      const requestData = {
-        ...companyData,
-        assumptions: {
-          min_linkedin: assumptions.minLinkedin,
-          max_google: assumptions.maxGoogle,
-          prefer_social: assumptions.preferSocial,
-          uncertainty_factor: assumptions.uncertaintyFactor
-        }
-      };
+    const requestData = {
+      ...companyData,
+      assumptions: {
+        min_linkedin: assumptions.minLinkedin,
+        max_google: assumptions.maxGoogle,
+        prefer_social: assumptions.preferSocial,
+        uncertainty_factor: assumptions.uncertaintyFactor
+      }
+    };
 
-      const response = await axios.post('/optimize', requestData);
+    try {
+      let finalResult;
+      try {
+        finalResult = await streamOptimization(requestData, setOptimizationProgress);
+      } catch (streamErr) {
+        if (!streamErr.streamUnavailable) throw streamErr;
+        // Older backends without /optimize/stream
+        const response = await axios.post('/optimize', requestData);
+        finalResult = response.data;
+      }
 
-      clearInterval(progressInterval);
       setOptimizationProgress(100);
 
       setTimeout(() => {
-        setResults(response.data);
+        setResults(finalResult);
         setOptimizationProgress(0);
       }, 300);
 
     } catch (err) {
-      setError(err.response?.data?.detail || 'Error optimizing budget');
+      setError(err.response?.data?.detail || err.message || 'Error optimizing budget');
       setOptimizationProgress(0);
     } finally {
       setTimeout(() => setLoading(false), 300);
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Budget Brain Load Test
+Drives /optimize, /research/{industry} and /client-examples concurrently
+
+The workload is the server's own LEOADS_CLIENTS list (read from /client-examples):
+/optimize bodies cycle through the example companies and /research picks their
+industries, mixed by --mix weights. Without --rate, --concurrency workers send
+back-to-back requests (closed loop). With --rate, requests are scheduled at that
+many per second (open loop), and latency is measured from the scheduled send time,
+so queueing behind a saturated server shows up in the percentiles.
+
+Reports p50/p95/p99 latency, throughput and error rate per endpoint.
+
+Usage:
+    python load_test.py --start-server --duration 30 --concurrency 16
+    python load_test.py --base-url http://localhost:8000 --rate 50 --json load.json
+    RESEARCH_BACKEND=fake BENCHMARK_STORE_DIR= python load_test.py --start-server   # offline research path
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+
+ENDPOINTS = ["optimize", "research", "clients"]
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class Workload:
+    """Builds (endpoint, method, path, body) requests from the LEOADS_CLIENTS examples."""
+
+    def __init__(self, clients: List[Dict[str, Any]], mix: Dict[str, float], seed: int, unique: bool):
+        self.clients = clients
+        self.industries = sorted({c["industry"] for c in clients})
+        self.endpoints = [e for e in ENDPOINTS if mix.get(e, 0) > 0]
+        self.weights = [mix[e] for e in self.endpoints]
+        self.unique = unique
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def next(self):
+        with self._lock:
+            endpoint = self._rng.choices(self.endpoints, self.weights)[0]
+            i = self._count
+            self._count += 1
+            jitter = self._rng.randint(1, 999)
+            industry = self._rng.choice(self.industries)
+        if endpoint == "optimize":
+            client = self.clients[i % len(self.clients)]
+            body = {k: client[k] for k in ("name", "budget", "goal", "industry")}
+            if self.unique:
+                body["budget"] += jitter  # distinct inputs, so the result cache cannot answer
+            return endpoint, "POST", "/optimize", body
+        if endpoint == "research":
+            return endpoint, "POST", f"/research/{industry}", None
+        return endpoint, "GET", "/client-examples", None
+
+
+class LoadRunner:
+    def __init__(self, base_url: str, workload: Workload, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.workload = workload
+        self.timeout = timeout
+        self.records: List[Dict[str, Any]] = []
+        self._records_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        # One keep-alive session per thread; requests.Session is not thread-safe
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def send(self, scheduled: Optional[float] = None) -> None:
+        endpoint, method, path, body = self.workload.next()
+        start = time.perf_counter()
+        status, error = None, None
+        try:
+            resp = self._session().request(method, self.base_url + path, json=body, timeout=self.timeout)
+            status = resp.status_code
+            if status >= 400:
+                error = f"HTTP {status}"
+        except requests.RequestException as e:
+            error = type(e).__name__
+        end = time.perf_counter()
+        record = {
+            "endpoint": endpoint,
+            "start": start,
+            "latency": end - (scheduled if scheduled is not None else start),
+            "status": status,
+            "error": error,
+        }
+        with self._records_lock:
+            self.records.append(record)
+
+    def run_closed_loop(self, concurrency: int, duration: float, total: Optional[int]) -> float:
+        deadline = time.perf_counter() + duration
+        remaining = [total]
+        lock = threading.Lock()
+
+        def worker():
+            while time.perf_counter() < deadline:
+                if total is not None:
+                    with lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                self.send()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - started
+
+    def run_open_loop(self, concurrency: int, rate: float, duration: float, total: Optional[int]) -> float:
+        n = total if total is not None else int(rate * duration)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for i in range(n):
+                scheduled = started + i / rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.send, scheduled)
+        return time.perf_counter() - started
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, int(round(q / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(records: List[Dict[str, Any]], elapsed: float) -> Dict[str, Dict[str, Any]]:
+    groups: Dict[str, List[Dict[str, Any]]] = {"all": records}
+    for r in records:
+        groups.setdefault(r["endpoint"], []).append(r)
+
+    summary = {}
+    for name, rows in groups.items():
+        latencies = sorted(r["latency"] * 1000.0 for r in rows)
+        errors = [r for r in rows if r["error"]]
+        error_kinds: Dict[str, int] = {}
+        for r in errors:
+            error_kinds[r["error"]] = error_kinds.get(r["error"], 0) + 1
+        summary[name] = {
+            "requests": len(rows),
+            "errors": len(errors),
+            "error_rate": len(errors) / len(rows) if rows else 0.0,
+            "error_kinds": error_kinds,
+            "throughput_rps": len(rows) / elapsed if elapsed > 0 else 0.0,
+            "mean_ms": sum(latencies) / len(latencies) if latencies else float("nan"),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": latencies[-1] if latencies else float("nan"),
+        }
+    return summary
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.setdefault("LOG_LEVEL", "WARNING")  # keep per-request access lines out of the measurement
+    cmd = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--app-dir", os.path.join(ROOT, "backend"),
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    print(f"🚀 Starting local uvicorn on port {port} ({workers} worker{'s' if workers > 1 else ''})")
+    return subprocess.Popen(cmd, env=env)
+
+
+def wait_until_up(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(base_url + "/", timeout=2).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server at {base_url} did not come up within {timeout:.0f}s")
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r} (choose from {', '.join(ENDPOINTS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--start-server", action="store_true", help="launch a local uvicorn for the run")
+    parser.add_argument("--port", type=int, default=8765, help="port for --start-server")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn worker processes for --start-server")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at most")
+    parser.add_argument("--rate", type=float, default=0.0, help="requests per second (0 = as fast as possible)")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, help="stop after this many requests instead")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("optimize=8,research=1,clients=1"),
+                        help="endpoint weights, e.g. optimize=8,research=1,clients=1")
+    parser.add_argument("--unique", action="store_true", help="jitter /optimize budgets so results are never cached")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if args.start_server:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.port, args.server_workers)
+    try:
+        wait_until_up(base_url)
+        clients = requests.get(base_url + "/client-examples", timeout=args.timeout).json()["clients"]
+        workload = Workload(clients, args.mix, args.seed, args.unique)
+        runner = LoadRunner(base_url, workload, args.timeout)
+
+        mode = f"{args.rate:g} req/s" if args.rate > 0 else "closed loop"
+        print(f"🔥 {base_url}: concurrency {args.concurrency}, {mode}, {len(clients)} example clients\n")
+        if args.rate > 0:
+            elapsed = runner.run_open_loop(args.concurrency, args.rate, args.duration, args.requests)
+        else:
+            elapsed = runner.run_closed_loop(args.concurrency, args.duration, args.requests)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    summary = summarize(runner.records, elapsed)
+    print(f"{'endpoint':<10} {'reqs':>6} {'err %':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name in ["all"] + [e for e in ENDPOINTS if e in summary]:
+        s = summary[name]
+        print(
+            f"{name:<10} {s['requests']:>6} {s['error_rate']:>6.1%} {s['throughput_rps']:>8.1f} "
+            f"{s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} {s['max_ms']:>8.1f}"
+        )
+    if summary["all"]["errors"]:
+        print(f"\n⚠️  Errors: {summary['all']['error_kinds']}")
+
+    if args.json:
+        report = {
+            "config": {
+                "base_url": base_url,
+                "concurrency": args.concurrency,
+                "rate": args.rate,
+                "duration": args.duration,
+                "requests": args.requests,
+                "mix": args.mix,
+                "unique": args.unique,
+                "seed": args.seed,
+            },
+            "elapsed_seconds": elapsed,
+            "summary": summary,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
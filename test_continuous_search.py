@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Budget Brain Continuous Search Test
+The continuous (linear program) search must never score below the 10% grid
+
+Runs in-process on the offline fallback priors for every LEOADS_CLIENTS example,
+in both scoring modes and under a few assumption overrides; no server needed.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from main import LEOADS_CLIENTS, AssumptionOverrides, BudgetOptimizer, CompanyInput  # noqa: E402
+
+ASSUMPTIONS = [
+    None,
+    AssumptionOverrides(prefer_social=True),
+    AssumptionOverrides(min_linkedin=20.0, max_google=40.0),
+]
+
+
+def test_continuous_never_scores_below_grid():
+    for scoring_mode in ("monte_carlo", "analytic"):
+        optimizer = BudgetOptimizer(seed=42, scoring_mode=scoring_mode)
+        service = optimizer.gemini_service
+        for client in LEOADS_CLIENTS:
+            for assumptions in ASSUMPTIONS:
+                company = CompanyInput(
+                    **{k: client[k] for k in ("name", "budget", "goal", "industry")}, assumptions=assumptions
+                )
+                ranges = service._apply_industry_modifiers_to_ranges(service._get_fallback_ranges(), company.industry)
+                table = optimizer._range_table(ranges)
+                block = optimizer._scoring_block(table)
+
+                grid = optimizer.feasible_allocations(company)
+                grid_best = optimizer.batch_score_allocations(grid, company, table, block=block).max()
+                alloc = optimizer.continuous_optimization(company, table, block=block)
+                assert alloc is not None, (scoring_mode, client["name"], assumptions)
+                weights = optimizer._allocation_matrix([alloc])
+                score = optimizer.batch_score_allocations(weights, company, table, block=block)[0]
+                assert score >= grid_best * (1 - 1e-9), (scoring_mode, client["name"], assumptions, score, grid_best)
+
+
+if __name__ == "__main__":
+    test_continuous_never_scores_below_grid()
+    print("✅ Continuous search matched or beat the grid for every example client")
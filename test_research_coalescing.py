@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Budget Brain Research Coalescing Test
+Concurrent benchmark requests for one industry must share a single Gemini call
+
+Runs in-process against FakeGeminiModel; no server or Gemini key needed.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from main import GEMINI_EXECUTOR, GEMINI_MAX_WORKERS, FakeGeminiModel, GeminiResearchService  # noqa: E402
+
+CONCURRENT_CALLERS = 40
+LATENCY_MS = 300
+
+
+def warm_executor():
+    """Start every GEMINI_EXECUTOR thread, the case where coalescing used to break."""
+    futures = [GEMINI_EXECUTOR.submit(time.sleep, 0.05) for _ in range(GEMINI_MAX_WORKERS)]
+    for f in futures:
+        f.result()
+
+
+async def gather_concurrently(service: GeminiResearchService, industry: str):
+    start = time.perf_counter()
+    payloads = await asyncio.gather(
+        *(service.agather_platform_benchmarks(industry) for _ in range(CONCURRENT_CALLERS))
+    )
+    return payloads, time.perf_counter() - start
+
+
+def test_concurrent_research_shares_one_gemini_call():
+    warm_executor()
+    model = FakeGeminiModel(latency_ms=LATENCY_MS, jitter_ms=0, error_rate=0, malformed_rate=0)
+    service = GeminiResearchService(model=model)
+    service.store = None  # exercise the Gemini path, not a stored payload
+
+    payloads, elapsed = asyncio.run(gather_concurrently(service, "b2b_saas"))
+
+    assert model.calls == 1, f"{model.calls} Gemini calls for one industry"
+    assert all(p is payloads[0] for p in payloads)
+    assert elapsed < 3 * LATENCY_MS / 1000, f"took {elapsed:.2f}s"
+
+
+if __name__ == "__main__":
+    test_concurrent_research_shares_one_gemini_call()
+    print("✅ Concurrent research requests shared one Gemini call")